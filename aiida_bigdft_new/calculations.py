@@ -3,6 +3,9 @@ Calculations provided by aiida_bigdft_new.
 
 Register calculations via the "aiida.calculations" entry point in setup.json.
 """
+import functools
+import inspect
+import json
 import os
 from pprint import pprint
 
@@ -12,15 +15,94 @@ from BigDFT.Inputfiles import Inputfile
 import BigDFT.Systems
 from BigDFT.Systems import System
 from BigDFT.UnitCells import UnitCell
-import yaml
+import numpy as np
 
 from aiida.common import datastructures
 from aiida.engine import CalcJob
 import aiida.orm
-from aiida.orm import Bool, SinglefileData, Str, StructureData, to_aiida_type
+from aiida.orm import AbstractCode, Bool, RemoteData, Str, StructureData, to_aiida_type
 
 from aiida_bigdft_new.data import BigDFTParameters
 from aiida_bigdft_new.data.BigDFTFile import BigDFTFile, BigDFTLogfile
+from aiida_bigdft_new.data.BigDFTTiming import BigDFTTimingData
+from aiida_bigdft_new.utils import input_cache, reduce_log, trajectory, yaml_backend
+from aiida_bigdft_new.utils.compression import COMPRESSIONS, compressed_name
+from aiida_bigdft_new.utils.estimate import estimate_mpiprocs
+from aiida_bigdft_new.utils.parse_pool import POOL_TYPES
+from aiida_bigdft_new.utils.posinp import posinp_to_xyz
+from aiida_bigdft_new.utils.summary import SUMMARY_SECTIONS
+
+# when the raw output files are kept in the repository after parsing
+KEEP_RAW = ("always", "on_failure", "never")
+
+# logfile sections kept by the remote reduction, those parsed into outputs
+REDUCED_SECTIONS = sorted(
+    {
+        *SUMMARY_SECTIONS,
+        *trajectory.STRUCTURE_KEYS,
+        trajectory.FORCES_KEY,
+        trajectory.ENERGY_KEY,
+    }
+)
+
+
+def _validate_parser_pool(value, _):
+    """Validate the `parser_pool` option."""
+    if value not in POOL_TYPES:
+        return f"parser_pool must be one of {POOL_TYPES}, not '{value}'"
+
+
+def _validate_store_compression(value, _):
+    """Validate the `store_compression` option."""
+    if value not in COMPRESSIONS:
+        return f"store_compression must be one of {COMPRESSIONS}, not '{value}'"
+
+
+def _validate_keep_raw(value, _):
+    """Validate the `keep_raw` option."""
+    if value not in KEEP_RAW:
+        return f"keep_raw must be one of {KEEP_RAW}, not '{value}'"
+
+
+def _validate_inputs(inputs, _):
+    """Validate the top level inputs."""
+    if "dry_run" in inputs and inputs["dry_run"].value:
+        if "estimate_code" not in inputs:
+            return "a dry run requires an `estimate_code`, running bigdft-tool"
+
+    return _validate_threads(inputs.get("metadata", {}).get("options", {}))
+
+
+def _validate_packed_inputs(inputs, _):
+    """Validate the top level inputs of a packed calculation."""
+    options = inputs.get("metadata", {}).get("options", {})
+    # every MPI launch would claim all the processes of the allocation
+    if options.get("concurrent") and options.get("withmpi"):
+        return "concurrent runs can not be launched with MPI, set withmpi to False"
+    return _validate_threads(options)
+
+
+def _validate_threads(options):
+    """Validate the OpenMP threads against the cores allocated per process."""
+    threads = options.get("omp_threads")
+    if threads is None:
+        return None
+    # without cores reserved for them, the threads would oversubscribe
+    cores = (options.get("resources") or {}).get("num_cores_per_mpiproc")
+    if cores is None:
+        return f"omp_threads ({threads}) requires the num_cores_per_mpiproc resource"
+    if cores != threads:
+        return (
+            f"omp_threads ({threads}) differs from the num_cores_per_mpiproc "
+            f"resource ({cores})"
+        )
+    return None
+
+
+def _validate_structures(value, _):
+    """Validate the structures of a packed calculation."""
+    if not value:
+        return "at least one structure is required"
 
 
 class BigDFTCalculation(CalcJob):
@@ -32,6 +114,16 @@ class BigDFTCalculation(CalcJob):
     _inpfile = "input.yaml"
     _logfile = "log.yaml"
     _timefile = "time.yaml"
+    _forcefile = "forces_posinp.yaml"
+    _datadir = "data"
+    # prefix of the structure files written at each step, in the data directory
+    _posout = "posout"
+    # input guess reading the wavefunctions from the data directory
+    _inputpsiid_restart = 2
+    _wavefunctions = "wavefunction*"
+    # script reducing the logfile on the compute node, and its configuration
+    _reduce_script = "reduce_log.py"
+    _reduce_config = "reduce_log.json"
 
     @classmethod
     def define(cls, spec):
@@ -61,13 +153,36 @@ class BigDFTCalculation(CalcJob):
             help="Command line parameters for BigDFT",
         )
 
+        spec.input(
+            "parent_folder",
+            valid_type=RemoteData,
+            required=False,
+            help="Folder of a previous calculation, whose wavefunctions (written "
+            "to its data directory with e.g. `output: {orbitals: binary}`) are "
+            "used to restart from",
+        )
         spec.input(
             "dry_run",
             valid_type=Bool,
             default=lambda: Bool(False),
-            help="Stops calculation after posinp writing if True",
+            help="Only estimate the memory and grid sizes with `estimate_code`, "
+            "into the `estimate` output, rather than running the calculation",
             serializer=to_aiida_type,
         )
+        spec.input(
+            "estimate_code",
+            valid_type=AbstractCode,
+            required=False,
+            help="bigdft-tool code, used for the memory estimation of a dry run",
+        )
+        spec.input(
+            "metadata.options.estimate_mpiprocs",
+            valid_type=int,
+            required=False,
+            help="Number of MPI processes to estimate the memory for, defaults to "
+            "that of the resources",
+        )
+        spec.inputs.validator = _validate_inputs
 
         # outputs
         spec.input(
@@ -75,8 +190,154 @@ class BigDFTCalculation(CalcJob):
             valid_type=str,
             default=BigDFTCalculation._logfile,
         )
-        spec.output("logfile", valid_type=BigDFTLogfile, help="BigDFT Logfile")
-        spec.output("timefile", valid_type=BigDFTFile, help="BigDFT timing file")
+        spec.input(
+            "metadata.options.symlink_parent",
+            valid_type=bool,
+            default=False,
+            help="Symlink the wavefunction files of `parent_folder` rather than "
+            "copy them. Wavefunctions written by the new run under the same names "
+            "then overwrite the parent's",
+        )
+        spec.input(
+            "metadata.options.omp_threads",
+            valid_type=int,
+            required=False,
+            help="OpenMP threads per MPI process, defaults to the "
+            "`num_cores_per_mpiproc` resource, which must be given with it",
+        )
+        spec.input(
+            "metadata.options.omp_proc_bind",
+            valid_type=str,
+            required=False,
+            help="Thread binding policy (OMP_PROC_BIND), e.g. 'close' or 'spread'",
+        )
+        spec.input(
+            "metadata.options.omp_places",
+            valid_type=str,
+            required=False,
+            help="Places threads are bound to (OMP_PLACES), e.g. 'cores'",
+        )
+        spec.input(
+            "metadata.options.write_posinp",
+            valid_type=bool,
+            default=False,
+            help="Also write the structure to the `posinp` file, in xyz format",
+        )
+        spec.input(
+            "metadata.options.retrieve_posout",
+            valid_type=bool,
+            default=False,
+            help="Retrieve the `data/posout_*.yaml` structure of each geometry "
+            "or MD step, to build the trajectory from instead of the logfile",
+        )
+        spec.input(
+            "metadata.options.parser_workers",
+            valid_type=int,
+            default=0,
+            help="Parse the logfile and timefile concurrently in a pool of this "
+            "many workers, 0 parses them inline",
+        )
+        spec.input(
+            "metadata.options.parser_pool",
+            valid_type=str,
+            default="process",
+            validator=_validate_parser_pool,
+            help="Kind of parser pool, either 'process' or 'thread'",
+        )
+        spec.input(
+            "metadata.options.store_compression",
+            valid_type=str,
+            default="none",
+            validator=_validate_store_compression,
+            help="Store the logfile and timefile compressed in the repository, "
+            "with 'gzip' or 'zstd'. They are decompressed transparently on reading",
+        )
+        spec.input(
+            "metadata.options.keep_raw",
+            valid_type=str,
+            default="always",
+            validator=_validate_keep_raw,
+            help="Keep the raw output files 'always', only 'on_failure' (as the "
+            "`raw_files` output), or 'never'. Otherwise they are retrieved to a "
+            "temporary folder, parsed and discarded",
+        )
+        spec.input(
+            "metadata.options.reduce_log",
+            valid_type=bool,
+            default=False,
+            help="Reduce the logfile to the parsed sections on the compute node "
+            "after the run, retrieving the full logfile and debug files gzipped",
+        )
+        spec.input(
+            "metadata.options.reduce_python",
+            valid_type=str,
+            default="python3",
+            help="Python interpreter running the logfile reduction on the "
+            "compute node",
+        )
+        spec.input(
+            "metadata.options.stderr_tail",
+            valid_type=int,
+            required=False,
+            help="Only scan this many bytes from the end of the scheduler stderr "
+            "for errors",
+        )
+        spec.output(
+            "logfile",
+            valid_type=BigDFTLogfile,
+            required=False,
+            help="BigDFT Logfile, unless the raw files are discarded",
+        )
+        spec.output(
+            "timefile",
+            valid_type=BigDFTFile,
+            required=False,
+            help="BigDFT timing file, not written by a dry run",
+        )
+        spec.output(
+            "raw_files",
+            valid_type=aiida.orm.FolderData,
+            required=False,
+            help="Raw output files of a failed calculation, with `keep_raw` "
+            "set to 'on_failure'",
+        )
+        spec.output(
+            "estimate",
+            valid_type=aiida.orm.Dict,
+            required=False,
+            help="Memory peak per MPI process (MB) and grid sizes, from a dry run",
+        )
+        spec.output(
+            "timing",
+            valid_type=BigDFTTimingData,
+            required=False,
+            help="Columnar timing categories and classes from the timing file",
+        )
+        spec.output(
+            "output_parameters",
+            valid_type=aiida.orm.Dict,
+            required=False,
+            help="Summary of key results extracted from the logfile",
+        )
+        spec.output(
+            "forces",
+            valid_type=aiida.orm.ArrayData,
+            required=False,
+            help="Final forces (Ha/Bohr) and positions (angstroem) of the atoms",
+        )
+        spec.output(
+            "trajectory",
+            valid_type=aiida.orm.TrajectoryData,
+            required=False,
+            help="Positions, cells, energies and forces of each step of a "
+            "geometry optimisation or MD run",
+        )
+        spec.output(
+            "output_structure",
+            valid_type=StructureData,
+            required=False,
+            help="Final structure",
+        )
 
         # error codes
         spec.exit_code(
@@ -111,33 +372,51 @@ class BigDFTCalculation(CalcJob):
 
         print("preparing for submission")
 
-        inpdict = Inputfile()
-        inpdict.update(self.inputs.parameters.get_dict())
-
         # structure = check_ortho(self.inputs.structure)
         structure = self.inputs.structure
+        parameters = self.inputs.parameters
+
+        overrides = {}
+        if "parent_folder" in self.inputs:
+            # read the parent's wavefunctions, unless told otherwise
+            if "inputpsiid" not in parameters.get_dict().get("dft", {}):
+                overrides["dft"] = {"inputpsiid": self._inputpsiid_restart}
+
+        # identical structure and parameters give an identical input file
+        key = input_cache.input_hash(structure, parameters, overrides)
+        text = input_cache.cached_input(
+            key, lambda: render_input(structure, parameters, overrides)
+        )
 
-        inpdict.update({"posinp": structure_to_posinp(structure)})
-
-        self.logger.info("inp dict is")
-        self.logger.info(inpdict)
-
-        with open(self._inpfile, "w+") as o:
+        # files are written to the sandbox, which is private to this submission
+        with folder.open(self._inpfile, "w", encoding="utf8") as o:
             self.logger.info(f"writing inputfile {self._inpfile}")
-            yaml.dump(dict(inpdict), o)
+            o.write(text)
+
+        if self.inputs.metadata.options.write_posinp:
+            posinp = input_cache.cached_posinp(structure, structure_to_posinp)
+            with folder.open(self.inputs.posinp.value, "w", encoding="utf8") as o:
+                o.write(posinp_to_xyz(posinp))
 
         if self.inputs.dry_run:
-            self.logger.warning("dry_run is true, exiting early")
+            self.logger.info("dry_run is true, only estimating the memory")
             codeinfo = datastructures.CodeInfo()
-            codeinfo.code_uuid = self.inputs.code.uuid
+            codeinfo.code_uuid = self.inputs.estimate_code.uuid
+            codeinfo.cmdline_params = [
+                "-a",
+                "memory-estimation",
+                "-l",
+                "-n",
+                str(estimate_mpiprocs(self.inputs.metadata.options)),
+            ]
+            codeinfo.withmpi = False
 
             calcinfo = datastructures.CalcInfo()
             calcinfo.codes_info = [codeinfo]
+            calcinfo.retrieve_list = [self.metadata.options.output_filename]
 
             return calcinfo
 
-        inpfile = SinglefileData(os.path.join(os.getcwd(), self._inpfile)).store()
-
         codeinfo = datastructures.CodeInfo()
         codeinfo.code_uuid = self.inputs.code.uuid
         codeinfo.withmpi = self.inputs.metadata.options.withmpi
@@ -145,26 +424,261 @@ class BigDFTCalculation(CalcJob):
         # Prepare a `CalcInfo` to be returned to the engine
         calcinfo = datastructures.CalcInfo()
         calcinfo.codes_info = [codeinfo]
-        calcinfo.local_copy_list = [
-            (
-                inpfile.uuid,
-                inpfile.filename,
-                inpfile.filename,
-            ),
-        ]
-        calcinfo.retrieve_list = [
+        calcinfo.prepend_text = openmp_environment(self.inputs.metadata.options)
+        calcinfo.local_copy_list = []
+        if "parent_folder" in self.inputs:
+            # only the wavefunctions, not the parent's timings or positions
+            folder.get_subfolder(self._datadir, create=True)
+            parent = self.inputs.parent_folder
+            entry = (
+                parent.computer.uuid,
+                os.path.join(
+                    parent.get_remote_path(), self._datadir, self._wavefunctions
+                ),
+                self._datadir,
+            )
+            if self.inputs.metadata.options.symlink_parent:
+                calcinfo.remote_symlink_list = [entry]
+            else:
+                calcinfo.remote_copy_list = [entry]
+        retrieve_list = [
             self.metadata.options.output_filename,
-            f"./data/{BigDFTCalculation._timefile}",
-            "forces_posinp.yaml",
+            f"./{self._datadir}/{BigDFTCalculation._timefile}",
+            BigDFTCalculation._forcefile,
             # "forces_posinp.xyz",
             # "final_posinp.yaml",
             # "final_posinp.xyz",
             ["./debug/bigdft-err*", ".", 2],
         ]
+        if self.inputs.metadata.options.retrieve_posout:
+            retrieve_list.append([f"./{self._datadir}/{self._posout}_*.yaml", ".", 2])
+        if self.inputs.metadata.options.reduce_log:
+            calcinfo.append_text = self.write_reduction(folder)
+            retrieve_list.append(
+                compressed_name(self.metadata.options.output_filename, "gzip")
+            )
+        # files retrieved to a temporary folder are discarded after parsing
+        if self.inputs.metadata.options.keep_raw == "always":
+            calcinfo.retrieve_list = retrieve_list
+        else:
+            calcinfo.retrieve_list = []
+            calcinfo.retrieve_temporary_list = retrieve_list
+
+        return calcinfo
+
+    def write_reduction(self, folder) -> str:
+        """
+        Write the logfile reduction script and its configuration to `folder`
+
+        :returns: the command running the reduction, to append to the job script
+        """
+        config = {
+            "logfile": self.metadata.options.output_filename,
+            "sections": REDUCED_SECTIONS,
+            "compress": ["debug/bigdft-err*"],
+        }
+        with folder.open(self._reduce_config, "w", encoding="utf8") as o:
+            json.dump(config, o, indent=2)
+        with folder.open(self._reduce_script, "w", encoding="utf8") as o:
+            o.write(inspect.getsource(reduce_log))
+
+        python = self.inputs.metadata.options.reduce_python
+        return f"{python} {self._reduce_script} {self._reduce_config}"
+
+
+class BigDFTPackedCalculation(CalcJob):
+    """
+    Many BigDFT runs with shared parameters, packed into one scheduler job
+
+    Each structure is run under its label as BigDFT run name, reading
+    `<label>.yaml` and writing `log-<label>.yaml` and its own
+    `data-<label>` directory, so the runs share the working directory
+    without clashing. Runs are launched back to back, or concurrently with
+    the `concurrent` option, in which case the resources are shared by all
+    of them. Concurrent runs are serial (`withmpi=False`): each MPI launch
+    would start as many processes as the whole allocation has slots.
+    """
+
+    _inpfile = "{}.yaml"
+    _logfile = "log-{}.yaml"
+    _timefile = "data-{}/time-{}.yaml"
+    _forcefile = "forces_{}.yaml"
+
+    @classmethod
+    def define(cls, spec):
+        """Define inputs and outputs of the calculation."""
+        super().define(spec)
+
+        spec.inputs["metadata"]["options"]["resources"].default = {
+            "num_machines": 1,
+            "num_mpiprocs_per_machine": 1,
+        }
+        spec.inputs["metadata"]["options"]["parser_name"].default = "bigdft_new.packed"
+
+        spec.input_namespace(
+            "structures",
+            valid_type=StructureData,
+            dynamic=True,
+            validator=_validate_structures,
+            help="Structures to run, the labels are used as BigDFT run names",
+        )
+        spec.input(
+            "parameters",
+            valid_type=BigDFTParameters,
+            help="Command line parameters for BigDFT, shared by all runs",
+        )
+        spec.input(
+            "metadata.options.concurrent",
+            valid_type=bool,
+            default=False,
+            help="Launch all runs at once rather than one after the other, "
+            "only for runs without MPI",
+        )
+        spec.input(
+            "metadata.options.omp_threads",
+            valid_type=int,
+            required=False,
+            help="OpenMP threads per MPI process, defaults to the "
+            "`num_cores_per_mpiproc` resource, which must be given with it",
+        )
+
+        spec.output_namespace(
+            "logfile",
+            valid_type=BigDFTLogfile,
+            dynamic=True,
+            help="BigDFT Logfile of each run",
+        )
+        spec.output_namespace(
+            "timing",
+            valid_type=BigDFTTimingData,
+            dynamic=True,
+            help="Columnar timing categories and classes of each run",
+        )
+        spec.output_namespace(
+            "output_parameters",
+            valid_type=aiida.orm.Dict,
+            dynamic=True,
+            help="Summary of key results of each run",
+        )
+        spec.output_namespace(
+            "output_structure",
+            valid_type=StructureData,
+            dynamic=True,
+            help="Final structure of each periodic run",
+        )
+        spec.inputs.validator = _validate_packed_inputs
+
+        spec.exit_code(
+            300,
+            "ERROR_MISSING_OUTPUT_FILES",
+            message="No run produced a logfile.",
+        )
+        spec.exit_code(
+            301,
+            "ERROR_PARSING_FAILED",
+            message="Parsing error.",
+        )
+        spec.exit_code(
+            302,
+            "ERROR_RUNS_FAILED",
+            message="Some of the runs did not produce a logfile: {labels}.",
+        )
+        spec.exit_code(
+            400,
+            "ERROR_OUT_OF_WALLTIME",
+            message="Calculation did not finish because of a walltime issue.",
+        )
+        spec.exit_code(
+            401,
+            "ERROR_OUT_OF_MEMORY",
+            message="Calculation did not finish because of memory limit.",
+        )
+
+    def prepare_for_submission(self, folder):
+        """
+        Write the input file of each run, and launch them all from one script
+
+        :param folder: an `aiida.common.folders.Folder` where the plugin should
+            temporarily place all files needed by the calculation.
+        :return: `aiida.common.datastructures.CalcInfo` instance
+        """
+        parameters = self.inputs.parameters
+
+        calcinfo = datastructures.CalcInfo()
+        calcinfo.codes_info = []
+        calcinfo.retrieve_list = []
+        for label, structure in sorted(self.inputs.structures.items()):
+            key = input_cache.input_hash(structure, parameters)
+            text = input_cache.cached_input(
+                key, functools.partial(render_input, structure, parameters)
+            )
+            with folder.open(self._inpfile.format(label), "w", encoding="utf8") as o:
+                o.write(text)
+
+            codeinfo = datastructures.CodeInfo()
+            codeinfo.code_uuid = self.inputs.code.uuid
+            codeinfo.cmdline_params = [label]
+            codeinfo.withmpi = self.inputs.metadata.options.withmpi
+            calcinfo.codes_info.append(codeinfo)
+
+            calcinfo.retrieve_list.extend(
+                [
+                    self._logfile.format(label),
+                    [f"./{self._timefile.format(label, label)}", ".", 2],
+                    self._forcefile.format(label),
+                ]
+            )
+
+        calcinfo.codes_run_mode = (
+            datastructures.CodeRunMode.PARALLEL
+            if self.inputs.metadata.options.concurrent
+            else datastructures.CodeRunMode.SERIAL
+        )
+        calcinfo.prepend_text = openmp_environment(self.inputs.metadata.options)
+        calcinfo.local_copy_list = []
 
         return calcinfo
 
 
+def render_input(structure, parameters, overrides=None) -> str:
+    """
+    Render the input file text from the structure and parameters, with
+    the {section: {key: value}} `overrides` set by the calculation
+    """
+    inpdict = Inputfile()
+    inpdict.update(parameters.get_dict())
+    for section, values in (overrides or {}).items():
+        inpdict[section] = {**inpdict.get(section, {}), **values}
+    inpdict.update(
+        {"posinp": input_cache.cached_posinp(structure, structure_to_posinp)}
+    )
+    return yaml_backend.dump(dict(inpdict))
+
+
+def openmp_environment(options) -> str:
+    """
+    Return the exports setting the OpenMP environment of the calculation's
+    options, for the submit script. Nothing is exported if no thread count
+    is given
+    """
+    threads = options.get("omp_threads")
+    if threads is None:
+        threads = (options.get("resources") or {}).get("num_cores_per_mpiproc")
+    if threads is None:
+        return ""
+
+    environment = {
+        "OMP_NUM_THREADS": threads,
+        "OMP_PROC_BIND": options.get("omp_proc_bind"),
+        "OMP_PLACES": options.get("omp_places"),
+    }
+    return "\n".join(
+        f"export {name}={value}"
+        for name, value in environment.items()
+        if value is not None
+    )
+
+
 def structure_to_system(
     structure: aiida.orm.StructureData, coerce=False
 ) -> BigDFT.Systems.System:
@@ -199,36 +713,26 @@ def structure_to_system(
 def structure_to_posinp(structure: aiida.orm.StructureData) -> dict:
     """
     Creates a posinp file from input aiida StructureData
-    """
-
-    def process_line(line: str) -> [str, list]:
-        """
-        xyz position lines are in the format
-        at x.x y.y z.z
-        split, and convert
-        """
-        at_sym = line.split()[0]
-        at_loc = [float(p) for p in line.split()[1:]]
-        return at_sym, at_loc
 
-    # print(f'creating bigdft System from {structure.get_description()}')
-
-    string = structure._prepare_xyz()[0].decode().split("\n")
-
-    # natoms = string[0]
-    # cell = [float(v) for v in structure.cell_lengths]
-    # pbc = structure.pbc
-
-    posinp = {"units": "angstroem"}
-
-    positions = []
-    for sym, loc in [process_line(line) for line in string[2:]]:
-        # print(f'appending {sym} at {loc}')
-        # frag.append(Atom({sym: loc, 'sym': sym, 'units': 'angstroem'}))
-
-        positions.append({sym: loc})
-
-    posinp["positions"] = positions
-    posinp["abc"] = structure.get_ase().cell.tolist()
-
-    return posinp
+    Sites and kinds are read directly from the node attributes, so that no
+    per-site objects are created
+    """
+    kinds = {}
+    for kind in structure.base.attributes.get("kinds"):
+        if len(kind["symbols"]) != 1 or 1.0 - sum(kind["weights"]) > 1.0e-6:
+            raise NotImplementedError(
+                "posinp for alloys or systems with vacancies not implemented."
+            )
+        kinds[kind["name"]] = kind["symbols"][0]
+
+    sites = structure.base.attributes.get("sites")
+    symbols = [kinds[site["kind_name"]] for site in sites]
+    positions = np.array([site["position"] for site in sites], dtype=float).reshape(
+        -1, 3
+    )
+
+    return {
+        "units": "angstroem",
+        "positions": [{sym: loc} for sym, loc in zip(symbols, positions.tolist())],
+        "abc": np.array(structure.base.attributes.get("cell"), dtype=float).tolist(),
+    }
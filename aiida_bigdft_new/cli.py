@@ -5,16 +5,24 @@ Register new commands either via the "console_scripts" entry point or plug them
 directly into the 'verdi' command by using AiiDA-specific entry points like
 "aiida.cmdline.data" (both in the setup.json file).
 """
-import sys
+from datetime import timedelta
+import itertools
+import os
 
 import click
 
 from aiida.cmdline.commands.cmd_data import verdi_data
+from aiida.cmdline.params import options
 from aiida.cmdline.params.types import DataParamType
 from aiida.cmdline.utils import decorators
+from aiida.common import timezone
 from aiida.orm import QueryBuilder
 from aiida.plugins import DataFactory
 
+from aiida_bigdft_new import stats
+from aiida_bigdft_new.utils.compression import COMPRESSIONS
+from aiida_bigdft_new.utils.export import export_name, export_node
+
 
 # See aiida.cmdline.data entry point in setup.json
 @verdi_data.group("bigdft_new")
@@ -22,40 +30,196 @@ def data_cli():
     """Command line interface for aiida-bigdft-new"""
 
 
+def _conditions(label=None, past_days=None, keys=()) -> dict:
+    """
+    Return the query filters selecting nodes by label pattern, age, and
+    the top level keys of their attributes
+    """
+    conditions = [{"attributes": {"has_key": key}} for key in keys]
+    if label is not None:
+        conditions.append({"label": {"like": label}})
+    if past_days is not None:
+        conditions.append({"ctime": {">": timezone.now() - timedelta(days=past_days)}})
+    return {"and": conditions} if conditions else {}
+
+
+# columns projected by `list`, as (projection, header)
+LIST_COLUMNS = (
+    ("id", "PK"),
+    ("uuid", "UUID"),
+    ("ctime", "Created"),
+    ("label", "Label"),
+)
+
+
 @data_cli.command("list")
+@options.LIMIT()
+@click.option("--offset", type=int, default=0, help="Skip this many entries.")
+@click.option(
+    "--label", help="Only include entries whose label matches this SQL LIKE pattern."
+)
+@click.option(
+    "--key",
+    "keys",
+    multiple=True,
+    help="Only include parameters setting this top level key, e.g. dft. "
+    "May be repeated.",
+)
+@options.PAST_DAYS()
+@options.RAW()
+@click.option(
+    "--batch-size",
+    type=int,
+    default=1000,
+    show_default=True,
+    help="Number of rows fetched from the database at once.",
+)
 @decorators.with_dbenv()
-def list_():  # pylint: disable=redefined-builtin
+def list_(
+    limit, offset, label, keys, past_days, raw, batch_size
+):  # pylint: disable=too-many-arguments
     """
-    Display all DiffParameters nodes
+    Display BigDFTParameters nodes, oldest first
+
+    Only the listed columns are queried, and rows are written as they are
+    fetched, so the nodes are never loaded
     """
-    DiffParameters = DataFactory("bigdft_new")
+    BigDFTParameters = DataFactory("bigdft_new")
 
     qb = QueryBuilder()
-    qb.append(DiffParameters)
-    results = qb.all()
+    qb.append(
+        BigDFTParameters,
+        filters=_conditions(label, past_days, keys),
+        project=[column for column, _ in LIST_COLUMNS],
+    )
+    qb.order_by({BigDFTParameters: {"id": "asc"}})
+    qb.offset(offset)
+    if limit is not None:
+        qb.limit(limit)
+
+    if not raw:
+        click.echo("\t".join(header for _, header in LIST_COLUMNS))
+    for pk, uuid, ctime, node_label in qb.iterall(batch_size=batch_size):
+        click.echo(f"{pk}\t{uuid}\t{ctime:%Y-%m-%d %H:%M:%S}\t{node_label}")
+
+
+@data_cli.command("stats")
+@click.option(
+    "--group-by",
+    "-g",
+    type=click.Choice(stats.GROUPS),
+    default="exit_status",
+    show_default=True,
+    help="Group the calculations by this value.",
+)
+@click.option(
+    "--quantity",
+    "-q",
+    "quantities",
+    type=click.Choice(stats.STATS_QUANTITIES),
+    multiple=True,
+    default=("walltime",),
+    show_default=True,
+    help="Summary quantity to aggregate. May be repeated.",
+)
+@options.PAST_DAYS()
+@click.option(
+    "--format",
+    "-f",
+    "fmt",
+    type=click.Choice(stats.FORMATS),
+    default="table",
+    show_default=True,
+)
+@decorators.with_dbenv()
+def stats_(group_by, quantities, past_days, fmt):
+    """
+    Display statistics of the BigDFT calculations
 
-    s = ""
-    for result in results:
-        obj = result[0]
-        s += f"{str(obj)}, pk: {obj.pk}\n"
-    sys.stdout.write(s)
+    Calculations are counted, and their summary quantities aggregated, per
+    group. The values are projected from the database, without loading any
+    node or logfile.
+    """
+    rows = stats.calculation_stats(group_by, quantities, past_days)
+    click.echo(stats.format_rows(rows, fmt))
+
+
+# types of node `export` can select by query
+EXPORT_TYPES = {"logfile": "bigdftlogfile", "file": "bigdftfile"}
 
 
 @data_cli.command("export")
-@click.argument("node", metavar="IDENTIFIER", type=DataParamType())
+@click.argument("nodes", metavar="IDENTIFIERS", type=DataParamType(), nargs=-1)
 @click.option(
     "--outfile",
     "-o",
     type=click.Path(dir_okay=False),
     help="Write output to file (default: print to stdout).",
 )
+@click.option(
+    "--output-dir",
+    "-d",
+    type=click.Path(file_okay=False),
+    help="Export each node to PK-FILENAME in this directory, for many nodes.",
+)
+@click.option(
+    "--compression",
+    "-c",
+    type=click.Choice(COMPRESSIONS),
+    default="none",
+    show_default=True,
+    help="Compress the output on the fly. zstd requires the zstandard package.",
+)
+@click.option(
+    "--type",
+    "node_type",
+    type=click.Choice(sorted(EXPORT_TYPES)),
+    help="Also export every node of this type matching --label and --past-days, "
+    "up to --limit nodes, into --output-dir.",
+)
+@click.option(
+    "--label", help="Only include entries whose label matches this SQL LIKE pattern."
+)
+@options.PAST_DAYS()
+@options.LIMIT()
 @decorators.with_dbenv()
-def export(node, outfile):
-    """Export a DiffParameters node (identified by PK, UUID or label) to plain text."""
-    string = str(node)
-
-    if outfile:
-        with open(outfile, "w", encoding="utf8") as f:
-            f.write(string)
-    else:
-        click.echo(string)
+def export(
+    nodes, outfile, output_dir, compression, node_type, label, past_days, limit
+):  # pylint: disable=too-many-arguments
+    """
+    Export BigDFT nodes (identified by PK, UUID or label) to plain text.
+
+    The files of logfile and other file nodes are streamed in chunks, and
+    parameters nodes are written as text.
+    """
+    if output_dir is None:
+        if len(nodes) != 1 or node_type is not None:
+            raise click.UsageError("exporting several nodes requires --output-dir")
+        if outfile:
+            with open(outfile, "wb") as out:
+                export_node(nodes[0], out, compression)
+        else:
+            export_node(nodes[0], click.get_binary_stream("stdout"), compression)
+        return
+
+    selected = iter(nodes)
+    if node_type is not None:
+        qb = QueryBuilder()
+        qb.append(
+            DataFactory(EXPORT_TYPES[node_type]),
+            filters=_conditions(label, past_days),
+            project="*",
+            tag="node",
+        )
+        qb.order_by({"node": {"id": "asc"}})
+        if limit is not None:
+            qb.limit(limit)
+        rows = qb.iterall(batch_size=100)
+        selected = itertools.chain(selected, (row[0] for row in rows))
+
+    os.makedirs(output_dir, exist_ok=True)
+    for node in selected:
+        path = os.path.join(output_dir, export_name(node, compression))
+        with open(path, "wb") as out:
+            export_node(node, out, compression)
+        click.echo(path)
@@ -2,23 +2,113 @@
 Module for adding extra BigDFT functionality to AiiDA's base SinglefileData
 """
 
+import contextlib
+from functools import partial
+import io
 import os
+import pathlib
+import tempfile
 
 from BigDFT.Logfiles import Logfile
-import yaml
 
 from aiida.orm import SinglefileData
 
+from aiida_bigdft_new.utils import compression as codec
+from aiida_bigdft_new.utils import yaml_backend, yaml_index
+
 
 class BigDFTFile(SinglefileData):
     """
     Wrapper class for a BigDFT yaml format file as SinglefileData
+
+    Nothing is read at construction. The first access to `content` indexes
+    the top level keys of the file, and each section is then only parsed
+    when it is accessed
+
+    The file can be stored compressed, see `set_file`. It is then
+    decompressed on the fly by `open`, `as_path` and `get_content`, so
+    reading it is unchanged. Only the repository accessors of `base.repository`
+    return the stored, compressed bytes
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, file=None, filename=None, compression="none", **kwargs):
+        """
+        :param file: an absolute filepath or binary filelike object whose
+            contents to copy
+        :param filename: specify filename to use (defaults to name of provided file)
+        :param compression: store the file compressed, "gzip" or "zstd"
+        """
+        super().__init__(None, filename=filename, **kwargs)
+        if file is not None:
+            self.set_file(file, filename=filename, compression=compression)
+
+    def set_file(self, file, filename=None, compression="none"):
+        """
+        Set the file content, invalidating any cached content
+
+        With a `compression` other than "none", the content is compressed in
+        chunks before being stored, under the same filename, and the
+        `compression` attribute records how
+        """
+        codec.check_compression(compression)
+        if compression == "none":
+            super().set_file(file, filename=filename)
+        else:
+            with contextlib.ExitStack() as stack:
+                if isinstance(file, (str, os.PathLike)):
+                    file = stack.enter_context(open(file, "rb"))
+                if filename is None:
+                    name = getattr(file, "name", self.DEFAULT_FILENAME)
+                    filename = os.path.basename(str(name))
+                if isinstance(file, io.TextIOBase):
+                    file = io.BytesIO(file.read().encode("utf8"))
+                copy = stack.enter_context(codec.compressed_copy(file, compression))
+                super().set_file(copy, filename=filename)
+        self.base.attributes.set("compression", compression)
+        self._content = None
+        self._documents = None
+
+    @property
+    def compression(self) -> str:
+        """
+        Compression of the stored file
+        """
+        return self.base.attributes.get("compression", "none")
+
+    @contextlib.contextmanager
+    def open(self, path=None, mode="r"):
+        """
+        Return an open file handle to the (decompressed) content of this node
+
+        Compressed content is decompressed as it is read. Seeking is
+        supported, though seeking backwards restarts the decompression
+        """
+        if path not in (None, self.filename) or self.compression == "none":
+            with super().open(path, mode=mode) as handle:
+                yield handle
+            return
+
+        opener = partial(super().open, mode="rb")
+        with codec.open_decompressed(opener, self.compression, mode=mode) as handle:
+            yield handle
+
+    @contextlib.contextmanager
+    def as_path(self):
+        """
+        Make the (decompressed) content available as a file on the local
+        file system
+
+        Compressed content is decompressed to a temporary file
+        """
+        if self.compression == "none":
+            with super().as_path() as filepath:
+                yield filepath
+            return
 
-        self._content = self._open()
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = pathlib.Path(directory) / self.filename
+            self.dump_file(str(filepath))
+            yield filepath
 
     def _open(self):
         """
@@ -26,32 +116,52 @@ class BigDFTFile(SinglefileData):
         """
         try:
             with self.open() as o:
-                return yaml.safe_load(o)
+                return yaml_backend.load(o)
         except FileNotFoundError:
             self.logger.warning(f"file {self.filename} could not be opened!")
             return {}
 
+    def _index(self):
+        """
+        Attempts to index the stored file, returning a lazily loaded mapping
+
+        Falls back to a full load for documents that are not block mappings
+        """
+        try:
+            with self.open(mode="rb") as o:
+                sections = yaml_index.index_sections(o)
+        except FileNotFoundError:
+            self.logger.warning(f"file {self.filename} could not be opened!")
+            return {}
+        except yaml_index.NotIndexableError:
+            return self._open()
+
+        return yaml_index.LazyYamlMapping(partial(self.open, mode="rb"), sections)
+
     @property
     def content(self):
         """
-        Attempts to return file content from cache, loading otherwise
+        Attempts to return file content from cache, indexing the file otherwise
         """
-        try:
-            return self._content
-        except AttributeError:
-            self._content = self._open()
-            return self._content
+        if getattr(self, "_content", None) is None:
+            self._content = self._index()
+        return self._content
 
-    def dump_file(self, path=None):
+    def dump_file(self, path=None, compression="none"):
         """
         Dump the stored file to `path`
-        defaults to cwd + filename if not provided
+        defaults to cwd + filename (and the compression's suffix) if not provided
+
+        The file is copied decompressed, in chunks, then compressed on the fly
+        with `compression` (see `aiida_bigdft_new.utils.compression`)
         """
-        path = path or os.path.join(os.getcwd(), self.filename)
+        name = codec.compressed_name(self.filename, compression)
+        path = path or os.path.join(os.getcwd(), name)
 
-        with self.open() as inp:
-            with open(path, "w+", encoding="utf8") as out:
-                out.write(inp.read())
+        with self.open(mode="rb") as inp:
+            with open(path, "wb") as out:
+                codec.copy_compressed(inp, out, compression)
+        return path
 
 
 class BigDFTLogfile(BigDFTFile):
@@ -63,5 +173,98 @@ class BigDFTLogfile(BigDFTFile):
     def logfile(self):
         """
         Create and return the BigDFT Logfile object
+
+        Note that this requires every section of the file to be parsed. They
+        are read together, in a single pass over the (decompressed) file
         """
-        return Logfile(dictionary=self.content)
+        content = self.content
+        content.preload(list(content))
+        return Logfile(dictionary=dict(content))
+
+    @property
+    def document_offsets(self) -> list:
+        """
+        Byte offsets of each yaml document within the file
+
+        BigDFT writes one document per geometry or MD step. The offsets are
+        found by a single scan of the file the first time they are needed
+        """
+        if getattr(self, "_documents", None) is None:
+            with self.open(mode="rb") as o:
+                self._documents = yaml_index.index_documents(o)
+        return self._documents
+
+    @property
+    def n_documents(self) -> int:
+        """
+        Number of yaml documents within the file
+        """
+        return len(self.document_offsets)
+
+    def _read_document(self, handle, index: int) -> bytes:
+        """
+        Read the raw text of document `index` from an open binary handle
+        """
+        start, end = self.document_offsets[index]
+        handle.seek(start)
+        return handle.read(end - start)
+
+    def get_document(self, index: int):
+        """
+        Return document `index` of the file (negative indices are allowed)
+
+        Only the requested document is parsed
+        """
+        with self.open(mode="rb") as o:
+            return yaml_backend.load(self._read_document(o, index))
+
+    def get_step(self, index: int):
+        """
+        Return document `index` of the file as a lazily loaded mapping,
+        where each section is only parsed when accessed
+
+        The sections of a compressed file are read from a copy of the
+        document in memory, rather than decompressing the file up to each
+        """
+        if self.compression != "none":
+            with self.open(mode="rb") as o:
+                return _document_step(self._read_document(o, index))
+
+        start, end = self.document_offsets[index]
+        with self.open(mode="rb") as o:
+            sections = yaml_index.index_sections(o, start, end)
+        return yaml_index.LazyYamlMapping(partial(self.open, mode="rb"), sections)
+
+    def iter_documents(self, start: int = 0):
+        """
+        Generator over the documents of the file, from document `start`
+
+        Documents are read and parsed one at a time, so at most one is held
+        in memory
+        """
+        with self.open(mode="rb") as o:
+            for index in range(start, self.n_documents):
+                yield yaml_backend.load(self._read_document(o, index))
+
+    def iter_steps(self, start: int = 0):
+        """
+        Generator over the documents of the file as lazily loaded mappings,
+        from document `start`. See `get_step`
+
+        Documents are read in turn through a single handle, which only moves
+        forwards, so a compressed file is decompressed once. Each mapping
+        reads its sections from a copy of its document in memory
+        """
+        with self.open(mode="rb") as o:
+            for index in range(start, self.n_documents):
+                yield _document_step(self._read_document(o, index))
+
+
+def _document_step(document: bytes):
+    """
+    Return the raw text of a single yaml `document` as a lazily loaded
+    mapping, reading its sections from memory
+    """
+    with io.BytesIO(document) as o:
+        sections = yaml_index.index_sections(o)
+    return yaml_index.LazyYamlMapping(partial(io.BytesIO, document), sections)
@@ -0,0 +1,214 @@
+"""
+Columnar storage of BigDFT timing data (time.yaml) as ArrayData
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from aiida.orm import ArrayData
+
+# per category columns, as stored in the node repository
+CATEGORY_ARRAYS = {
+    "section": str,
+    "category": str,
+    "class": str,
+    "percent": float,
+    "time": float,
+    "load": float,
+}
+# per class columns
+CLASS_ARRAYS = {
+    "class_section": str,
+    "class_name": str,
+    "class_percent": float,
+    "class_time": float,
+    "class_max": float,
+    "class_min": float,
+}
+
+
+def _padded(values, length: int) -> list:
+    """
+    Return the first `length` floats of `values`, padding with nan
+    """
+    values = [float(v) for v in (values or [])[:length]]
+    return values + [np.nan] * (length - len(values))
+
+
+def timing_columns(content: Mapping) -> tuple:
+    """
+    Extract the columns of a BigDFTTimingData from the (loaded) content of a
+    time.yaml file
+
+    :returns: (arrays, attributes) dicts, see `BigDFTTimingData.from_columns`
+    """
+    categories = []
+    classes = []
+    for section, data in content.items():
+        if not isinstance(data, Mapping):
+            continue
+        for name, values in (data.get("Classes") or {}).items():
+            classes.append((section, name, *_padded(values, 4)))
+        for name, category in (data.get("Categories") or {}).items():
+            categories.append(
+                (
+                    section,
+                    name,
+                    category.get("Class", ""),
+                    *_padded(category.get("Data"), 3),
+                )
+            )
+
+    arrays = {}
+    for names, rows in ((CATEGORY_ARRAYS, categories), (CLASS_ARRAYS, classes)):
+        columns = list(zip(*rows)) or [()] * len(names)
+        for (name, dtype), column in zip(names.items(), columns):
+            arrays[name] = np.array(column, dtype=dtype)
+
+    attributes = {}
+    summary = content.get("SUMMARY") or {}
+    if "Total" in summary:
+        attributes["total_time"] = float(summary["Total"][1])
+    parallelism = summary.get("CPU Parallelism") or {}
+    if "MPI tasks" in parallelism:
+        attributes["mpi_tasks"] = int(parallelism["MPI tasks"])
+    if "OMP threads" in parallelism:
+        attributes["omp_threads"] = int(parallelism["OMP threads"])
+
+    return arrays, attributes
+
+
+class BigDFTTimingData(ArrayData):
+    """
+    BigDFT timing categories and classes, stored as numpy columns
+
+    Each row of the category arrays is one timing category of one section
+    (e.g. INIT, WFN_OPT) of the time.yaml file, each row of the class arrays
+    one class. Load values are relative to the average over MPI ranks, so
+    `class_max` and `class_min` give the spread between the slowest and
+    fastest ranks.
+    """
+
+    @classmethod
+    def from_content(cls, content: Mapping):
+        """
+        Create a node from the (loaded) content of a time.yaml file
+        """
+        return cls.from_columns(*timing_columns(content))
+
+    @classmethod
+    def from_columns(cls, arrays: dict, attributes: dict):
+        """
+        Create a node from precomputed columns, see `timing_columns`
+
+        :param arrays: {name: array} of the CATEGORY_ARRAYS and CLASS_ARRAYS
+        :param attributes: summary attributes (total_time, mpi_tasks, ...)
+        """
+        node = cls()
+        for name, array in arrays.items():
+            node.set_array(name, array)
+        for name, value in attributes.items():
+            node.base.attributes.set(name, value)
+        return node
+
+    @property
+    def sections(self) -> list:
+        """
+        Names of the timed sections, in file order
+        """
+        names, index = np.unique(self.get_array("class_section"), return_index=True)
+        return names[np.argsort(index)].tolist()
+
+    def _mask(self, section, column="section"):
+        """
+        Boolean mask selecting the rows of `section` (all rows if None)
+        """
+        values = self.get_array(column)
+        if section is None:
+            return np.ones(values.shape, dtype=bool)
+        return values == section
+
+    def top_categories(self, n: int = 10, section: str = None) -> list:
+        """
+        Return the `n` most expensive categories as (category, class, time)
+        """
+        mask = self._mask(section)
+        names = self.get_array("category")[mask]
+        classes = self.get_array("class")[mask]
+        times = self.get_array("time")[mask]
+
+        order = np.argsort(times)[::-1][:n]
+        return list(
+            zip(names[order].tolist(), classes[order].tolist(), times[order].tolist())
+        )
+
+    def class_totals(self, section: str = None) -> dict:
+        """
+        Return the total time spent in each class, excluding the `Total` rows
+        """
+        mask = self._mask(section, "class_section")
+        names = self.get_array("class_name")
+        mask &= names != "Total"
+
+        unique, inverse = np.unique(names[mask], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.get_array("class_time")[mask])
+        return dict(zip(unique.tolist(), totals.tolist()))
+
+    def load_imbalance(self, section: str = None) -> dict:
+        """
+        Return the max/min load ratio between MPI ranks for each class
+
+        A ratio of 1 indicates perfect balance
+        """
+        mask = self._mask(section, "class_section")
+        names = self.get_array("class_name")[mask]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = (
+                self.get_array("class_max")[mask] / self.get_array("class_min")[mask]
+            )
+        if section is None:
+            names = np.char.add(
+                np.char.add(self.get_array("class_section")[mask], "/"), names
+            )
+        return dict(zip(names.tolist(), ratio.tolist()))
+
+
+def time_matrix(nodes, level: str = "class", section: str = None) -> tuple:
+    """
+    Aggregate the time per class (or category) over many timing nodes
+
+    Only the arrays are loaded from each node, and the reduction is done with
+    numpy over the concatenated columns
+
+    :param nodes: iterable of BigDFTTimingData
+    :param level: either "class" or "category"
+    :param section: restrict to a single section, otherwise sum over sections
+    :returns: (names, matrix) where matrix[i, j] is the time of names[j]
+        for the i-th node
+    """
+    if level == "class":
+        name_col, section_col, time_col = "class_name", "class_section", "class_time"
+    elif level == "category":
+        name_col, section_col, time_col = "category", "section", "time"
+    else:
+        raise ValueError(f"level must be 'class' or 'category', not '{level}'")
+
+    names = []
+    times = []
+    rows = []
+    for i, node in enumerate(nodes):
+        mask = node.get_array(name_col) != "Total"
+        if section is not None:
+            mask &= node.get_array(section_col) == section
+        names.append(node.get_array(name_col)[mask])
+        times.append(node.get_array(time_col)[mask])
+        rows.append(np.full(mask.sum(), i))
+
+    if not names:
+        return [], np.zeros((0, 0))
+
+    unique, columns = np.unique(np.concatenate(names), return_inverse=True)
+    matrix = np.zeros((len(names), len(unique)))
+    np.add.at(matrix, (np.concatenate(rows), columns), np.concatenate(times))
+    return unique.tolist(), matrix
@@ -4,14 +4,77 @@ Parsers provided by aiida_bigdft_new.
 Register parsers via the "aiida.parsers" entry point in setup.json.
 """
 import os
-import re
 
 from aiida.common import exceptions
 from aiida.engine import ExitCode
+from aiida.orm import ArrayData, Dict, FolderData, StructureData, TrajectoryData
 from aiida.parsers.parser import Parser
 
-from aiida_bigdft_new.calculations import BigDFTCalculation
+from aiida_bigdft_new.calculations import BigDFTCalculation, BigDFTPackedCalculation
 from aiida_bigdft_new.data.BigDFTFile import BigDFTFile, BigDFTLogfile
+from aiida_bigdft_new.data.BigDFTTiming import BigDFTTimingData, timing_columns
+from aiida_bigdft_new.utils import trajectory, yaml_backend
+from aiida_bigdft_new.utils.estimate import estimate_mpiprocs, extract_estimate
+from aiida_bigdft_new.utils.parse_pool import parse_concurrently
+from aiida_bigdft_new.utils.posinp import read_posinp
+from aiida_bigdft_new.utils.stderr import scan_stderr
+from aiida_bigdft_new.utils.summary import extract_summary
+
+
+def posinp_to_structure(posinp: dict):
+    """
+    Return the StructureData of a `read_posinp` dict, or None if it is not
+    periodic in all directions
+
+    Free and surface boundary conditions have no complete cell to build from
+    """
+    if posinp["cell"] is None or not all(posinp["pbc"]):
+        return None
+    structure = StructureData(cell=posinp["cell"].tolist(), pbc=posinp["pbc"])
+    for symbol, position in zip(posinp["symbols"], posinp["positions"]):
+        structure.append_atom(position=position.tolist(), symbols=symbol)
+    return structure
+
+
+class OutputFiles:
+    """
+    Read access to the files of a calculation: those of the retrieved
+    folder, and those retrieved to the temporary folder only for parsing
+
+    Files are looked up in the temporary folder first. The interface is
+    that of the retrieved FolderData
+    """
+
+    def __init__(self, retrieved, temporary: str = None):
+        self.retrieved = retrieved
+        self.temporary = temporary
+
+    def list_object_names(self, path: str = None) -> list:
+        """
+        Names of the files and directories in `path`, or at the top level
+        """
+        names = set()
+        try:
+            names.update(self.retrieved.list_object_names(path))
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        if self.temporary is not None:
+            directory = os.path.join(self.temporary, path or "")
+            if os.path.isdir(directory):
+                names.update(os.listdir(directory))
+        return sorted(names)
+
+    def open(self, path: str, mode: str = "r"):
+        """
+        Open the file `path`, in text or binary (`mode="rb"`) mode
+        """
+        if self.temporary is not None:
+            filepath = os.path.join(self.temporary, path)
+            if os.path.isfile(filepath):
+                if "b" in mode:
+                    return open(filepath, mode)  # pylint: disable=unspecified-encoding
+                return open(filepath, mode, encoding="utf8")
+        return self.retrieved.open(path, mode)
 
 
 class BigDFTParser(Parser):
@@ -35,53 +98,88 @@ class BigDFTParser(Parser):
     def parse_stderr(self, inputfile):
         """Parse the stderr file to get commong errors, such as OOM or timeout.
 
-        :param i inputfile: stderr file
+        The file is scanned in a single pass, for the patterns registered in
+        `aiida_bigdft_new.utils.stderr`
+
+        :param i inputfile: stderr file handle or content
         :returns: exit code in case of an error, None otherwise
         """
-        timeout_messages = {
-            "DUE TO TIME LIMIT",  # slurm
-            "exceeded hard wallclock time",  # UGE
-            "TERM_RUNLIMIT: job killed",  # LFS
-            "walltime .* exceeded limit",  # PBS/Torque
-        }
+        label = scan_stderr(inputfile, tail=self.node.get_option("stderr_tail"))
+        if label is None:
+            return None
+        try:
+            return getattr(self.exit_codes, label)
+        except AttributeError:
+            self.logger.warning(f"stderr pattern mapped to unknown exit code {label}")
+            return None
 
-        oom_messages = {
-            "[oO]ut [oO]f [mM]emory",
-            "oom-kill",  # generic OOM messages
-            "Exceeded .* memory limit",  # slurm
-            "exceeds job hard limit .*mem.* of queue",  # UGE
-            "TERM_MEMLIMIT: job killed after reaching LSF memory usage limit",  # LFS
-            "mem .* exceeded limit",  # PBS/Torque
-        }
-        for message in timeout_messages:
-            if re.search(message, inputfile):
-                return self.exit_codes.ERROR_OUT_OF_WALLTIME
-        for message in oom_messages:
-            if re.search(message, inputfile):
-                return self.exit_codes.ERROR_OUT_OF_MEMORY
-        return
+    def parse_scheduler_stderr(self):
+        """
+        Parse the retrieved scheduler stderr, if any
+
+        :returns: exit code in case of an error, None otherwise
+        """
+        exitcode = None
+        stderr_filename = self.node.get_option("scheduler_stderr")
+        if stderr_filename in self.files.list_object_names():
+            with self.files.open(stderr_filename, "rb") as stderr:
+                exitcode = self.parse_stderr(stderr)
+            if exitcode:
+                self.logger.error("Error in stderr: " + exitcode.message)
+        return exitcode
 
     def parse(self, **kwargs):
         """
         Parse outputs, store results in database.
 
+        With the `keep_raw` option, the raw files are retrieved to a
+        temporary folder, and are only stored as the `raw_files` output of
+        a failed calculation if it is "on_failure"
+
         :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
         """
+        self.files = OutputFiles(
+            self.retrieved, kwargs.get("retrieved_temporary_folder")
+        )
 
-        exitcode = ExitCode(0)
+        exitcode = self.parse_outputs()
 
-        stderr = self.node.get_scheduler_stderr()
-        if stderr:
-            exitcode = self.parse_stderr(stderr)
-            if exitcode:
-                self.logger.error("Error in stderr: " + exitcode.message)
+        failed = exitcode is not None and exitcode.status
+        temporary = self.files.temporary
+        if failed and temporary is not None and self.keep_raw == "on_failure":
+            self.logger.info("Storing the raw files of the failed calculation")
+            self.out("raw_files", FolderData(tree=temporary))
+
+        return exitcode
+
+    @property
+    def keep_raw(self) -> str:
+        """
+        When the raw files are kept, see the `keep_raw` option
+        """
+        return self.node.get_option("keep_raw") or "always"
+
+    @property
+    def store_raw(self) -> bool:
+        """
+        Whether the logfile and timefile are stored as outputs
+        """
+        return self.is_dry_run or self.keep_raw == "always"
+
+    def parse_outputs(self):
+        """
+        Parse the output files, registering the output nodes
+
+        :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
+        """
+        exitcode = self.parse_scheduler_stderr() or ExitCode(0)
 
         output_filename = self.node.get_option("output_filename")
         # jobname = self.node.get_option('jobname')
         # if jobname is not None:
         #     output_filename = "log-" + jobname + ".yaml"
         # Check that folder content is as expected
-        files_retrieved = self.retrieved.list_object_names()
+        files_retrieved = self.files.list_object_names()
         files_expected = [output_filename]
         # Note: set(A) <= set(B) checks whether A is a subset of B
         if not set(files_expected) <= set(files_retrieved):
@@ -91,44 +189,285 @@ class BigDFTParser(Parser):
             return self.exit_codes.ERROR_MISSING_OUTPUT_FILES
 
         logfile = self.parse_file(output_filename, "logfile", exitcode)
-        timefile = self.parse_file("time.yaml", "timefile", exitcode)
+        if isinstance(logfile, ExitCode):
+            return logfile
 
-        self.out("logfile", logfile)
-        self.out("timefile", timefile)
+        if self.is_dry_run:
+            return self.parse_estimate(logfile, exitcode)
+
+        timefile = self.parse_file(BigDFTCalculation._timefile, "timefile", exitcode)
+        if isinstance(timefile, ExitCode):
+            return timefile
+
+        summary, columns = self.extract_results(logfile, timefile)
+        if logfile is not None:
+            if self.store_raw:
+                self.out("logfile", logfile)
+            # store the key results as attributes, so queries need not open the logfile
+            self.out("output_parameters", Dict(summary))
+        if timefile is not None:
+            if self.store_raw:
+                self.out("timefile", timefile)
+            self.out("timing", BigDFTTimingData.from_columns(*columns))
+
+        if BigDFTCalculation._forcefile in files_retrieved:
+            failure = self.parse_forces(BigDFTCalculation._forcefile, exitcode)
+            if failure is not None:
+                return failure
+
+        if logfile is not None:
+            self.parse_trajectory(logfile)
 
         return exitcode
 
     def parse_file(self, output_filename, name, exitcode):
         """
-        Parse a retrieved file into a BigDFTFile object
-        """
+        Stream a retrieved file into a stored BigDFTFile object
 
-        # add output file
+        The file is copied directly from the retrieved folder into the new
+        node's repository, without being read into memory or parsed. It is
+        compressed on the way if the `store_compression` option is set.
+        The node is only stored if the raw files are kept, see `store_raw`
+
+        :returns: the stored node, or None on failure if `exitcode` is already
+            set (failure is then handled later), otherwise an error exit code
+        """
         self.logger.info(f"Parsing '{output_filename}'")
+        cls = BigDFTLogfile if name == "logfile" else BigDFTFile
+        filename = os.path.basename(output_filename)
+        compression = self.node.get_option("store_compression") or "none"
         try:
-            with open(output_filename, "w+") as tmp:
-                tmp.write(self.retrieved.get_object_content(output_filename))
-                if name == "logfile":
-                    output = BigDFTLogfile(os.path.join(os.getcwd(), output_filename))
-                else:
-                    output = BigDFTFile(os.path.join(os.getcwd(), output_filename))
-
-        except ValueError:
-            self.logger.error(f"Impossible to parse {name} {output_filename}")
-            if (
-                not exitcode
-            ):  # if we already have OOW or OOM, failure here will be handled later
-                return self.exit_codes.ERROR_PARSING_FAILED
-        try:
-            output.store()
-            self.logger.info(f"Successfully parsed {name} '{output_filename}'")
+            with self.files.open(output_filename, "rb") as handle:
+                output = cls(handle, filename=filename, compression=compression)
+            if self.store_raw:
+                output.store()
+        except FileNotFoundError:
+            self.logger.error(f"Impossible to find {name} '{output_filename}'")
         except exceptions.ValidationError:
-            self.logger.info(
-                f"Impossible to store {name} - ignoring '{output_filename}'"
+            self.logger.error(f"Impossible to store {name} '{output_filename}'")
+        else:
+            self.logger.info(f"Successfully parsed {name} '{output_filename}'")
+            return output
+
+        # if we already have OOW or OOM, failure here will be handled later
+        if exitcode is None or not exitcode.status:
+            return self.exit_codes.ERROR_PARSING_FAILED
+        return None
+
+    @property
+    def is_dry_run(self) -> bool:
+        """
+        Whether the calculation was a memory estimation (dry) run
+        """
+        return "dry_run" in self.node.inputs and self.node.inputs.dry_run.value
+
+    def parse_estimate(self, logfile, exitcode):
+        """
+        Output the logfile of a dry run, and the memory estimate read from it
+        """
+        if logfile is None:
+            return exitcode
+        self.out("logfile", logfile)
+        try:
+            estimate = extract_estimate(
+                logfile.content, estimate_mpiprocs(self.node.get_options())
             )
-            if (
-                not exitcode
-            ):  # if we already have OOW or OOM, failure here will be handled later
+        except ValueError as exception:
+            self.logger.error(str(exception))
+            return self.exit_codes.ERROR_PARSING_FAILED
+        self.out("estimate", Dict(estimate))
+        return exitcode
+
+    def extract_results(self, logfile, timefile):
+        """
+        Extract the logfile summary and timefile columns, concurrently in a
+        pool if the `parser_workers` option is set and the files are stored
+
+        :returns: (summary, columns), None for any missing file
+        """
+        workers = self.node.get_option("parser_workers")
+        # workers load the nodes from the database
+        if workers and self.store_raw:
+            pool_type = self.node.get_option("parser_pool") or "process"
+            self.logger.info(f"Parsing in a {pool_type} pool of {workers} workers")
+            return parse_concurrently(logfile, timefile, pool_type, workers)
+
+        summary = None if logfile is None else extract_summary(logfile.content)
+        columns = None if timefile is None else timing_columns(timefile.content)
+        return summary, columns
+
+    def read_forcefile(self, filename):
+        """
+        Read a final positions and forces file, which a killed run may have
+        left truncated
+
+        :returns: the `read_posinp` dict, or None if the file is malformed
+        """
+        try:
+            with self.files.open(filename, "rb") as o:
+                return read_posinp(yaml_backend.load(o))
+        except (
+            *yaml_backend.errors(),
+            AttributeError,
+            KeyError,
+            TypeError,
+            ValueError,
+        ) as exception:
+            self.logger.error(f"Impossible to read '{filename}': {exception}")
+            return None
+
+    def parse_forces(self, filename, exitcode):
+        """
+        Parse the final positions and forces file into `forces` ArrayData,
+        and the final structure into `output_structure`
+
+        :returns: None on success, or on failure if `exitcode` is already set
+            (failure is then handled later), otherwise an error exit code
+        """
+        self.logger.info(f"Parsing '{filename}'")
+        posinp = self.read_forcefile(filename)
+        if posinp is None:
+            if exitcode is None or not exitcode.status:
                 return self.exit_codes.ERROR_PARSING_FAILED
+            return None
+
+        forces = ArrayData()
+        forces.set_array("positions", posinp["positions"])
+        if "forces" in posinp:
+            forces.set_array("forces", posinp["forces"])
+        forces.base.attributes.set("symbols", posinp["symbols"])
+        if "energy" in posinp:
+            forces.base.attributes.set("energy", posinp["energy"])
+        self.out("forces", forces)
+
+        structure = posinp_to_structure(posinp)
+        if structure is not None:
+            self.out("output_structure", structure)
+        return None
+
+    def parse_trajectory(self, logfile):
+        """
+        Build the `trajectory` output of a run of several steps, from the
+        retrieved posout files if any, otherwise from the logfile documents
+
+        Steps are read one at a time, see `aiida_bigdft_new.utils.trajectory`
+        """
+        datadir = BigDFTCalculation._datadir
+        prefix = BigDFTCalculation._posout
+        posouts = []
+        if datadir in self.files.list_object_names():
+            posouts = [
+                f"{datadir}/{name}"
+                for name in self.files.list_object_names(datadir)
+                if name.startswith(prefix) and name.endswith(".yaml")
+            ]
+
+        if posouts:
+            n_steps = len(posouts)
+            steps = trajectory.posout_steps(self.files, posouts)
+        else:
+            n_steps = logfile.n_documents
+            steps = trajectory.logfile_steps(logfile)
+        if n_steps < 2:
+            return
+
+        self.logger.info(f"Parsing a trajectory of up to {n_steps} steps")
+        try:
+            arrays = trajectory.trajectory_arrays(steps, n_steps)
+        except ValueError as exception:
+            self.logger.warning(f"No trajectory: {exception}")
+            return
 
-        return output
+        output = TrajectoryData()
+        output.set_trajectory(
+            arrays["symbols"], arrays["positions"], cells=arrays["cells"]
+        )
+        output.set_array("energies", arrays["energies"])
+        output.set_array("forces", arrays["forces"])
+        self.out("trajectory", output)
+
+
+class BigDFTPackedParser(BigDFTParser):
+    """
+    Parser splitting the output of a packed calculation into the outputs of
+    each of its runs
+    """
+
+    def __init__(self, node):
+        """
+        Initialize Parser instance
+
+        Checks that the ProcessNode being passed was produced by a
+        BigDFTPackedCalculation.
+
+        :param node: ProcessNode of calculation
+        :param type node: :class:`aiida.orm.nodes.process.process.ProcessNode`
+        """
+        Parser.__init__(self, node)  # pylint: disable=non-parent-init-called
+        if not issubclass(node.process_class, BigDFTPackedCalculation):
+            raise exceptions.ParsingError("Can only parse BigDFTPackedCalculation")
+
+    def parse(self, **kwargs):
+        """
+        Parse the outputs of each run, store results in database.
+
+        Runs which wrote no logfile are skipped, and reported by the
+        `ERROR_RUNS_FAILED` exit code
+
+        :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
+        """
+        calc = BigDFTPackedCalculation
+        self.files = OutputFiles(
+            self.retrieved, kwargs.get("retrieved_temporary_folder")
+        )
+        exitcode = self.parse_scheduler_stderr() or ExitCode(0)
+        files_retrieved = set(self.files.list_object_names())
+
+        outputs = {
+            "logfile": {},
+            "timing": {},
+            "output_parameters": {},
+            "output_structure": {},
+        }
+        failed = []
+        for label in sorted(self.node.inputs.structures):
+            logname = calc._logfile.format(label)
+            if logname not in files_retrieved:
+                failed.append(label)
+                continue
+
+            logfile = self.parse_file(logname, "logfile", exitcode)
+            if isinstance(logfile, ExitCode):
+                return logfile
+            timename = calc._timefile.format(label, label)
+            timefile = None
+            if os.path.dirname(timename) in files_retrieved:
+                timefile = self.parse_file(timename, "timefile", exitcode)
+                if isinstance(timefile, ExitCode):
+                    return timefile
+
+            summary, columns = self.extract_results(logfile, timefile)
+            outputs["logfile"][label] = logfile
+            outputs["output_parameters"][label] = Dict(summary)
+            if columns is not None:
+                outputs["timing"][label] = BigDFTTimingData.from_columns(*columns)
+
+            forcename = calc._forcefile.format(label)
+            if forcename in files_retrieved:
+                posinp = self.read_forcefile(forcename)
+                structure = None if posinp is None else posinp_to_structure(posinp)
+                if structure is not None:
+                    outputs["output_structure"][label] = structure
+
+        for name, nodes in outputs.items():
+            if nodes:
+                self.out(name, nodes)
+
+        if exitcode.status:
+            return exitcode
+        if not outputs["logfile"]:
+            return self.exit_codes.ERROR_MISSING_OUTPUT_FILES
+        if failed:
+            self.logger.error(f"Runs {failed} produced no logfile")
+            return self.exit_codes.ERROR_RUNS_FAILED.format(labels=", ".join(failed))
+        return exitcode
@@ -0,0 +1,194 @@
+"""
+Statistics over many BigDFT calculations
+
+The exit status of each calculation and the quantities of its
+`output_parameters` summary are projected from the database, so no node or
+logfile is loaded. Groups are then reduced with NumPy.
+
+Usage::
+
+    from aiida_bigdft_new.stats import calculation_stats, format_rows
+
+    rows = calculation_stats(group_by="nat", quantities=("walltime",))
+    print(format_rows(rows, "table"))
+"""
+import csv
+from datetime import timedelta
+import io
+import json
+
+import numpy as np
+from tabulate import tabulate
+
+from aiida.common import timezone
+from aiida.orm import CalcJobNode, Dict, QueryBuilder
+
+from aiida_bigdft_new.calculations import BigDFTCalculation
+
+# numerical summary quantities which can be aggregated or grouped by
+STATS_QUANTITIES = (
+    "energy",
+    "fermi_level",
+    "forcemax",
+    "memory_peak",
+    "memory_used",
+    "walltime",
+    "nat",
+    "mpi_tasks",
+    "omp_threads",
+)
+GROUPS = ("exit_status", "nat", "mpi_tasks", "omp_threads")
+FORMATS = ("table", "csv", "json")
+
+
+def collect(names, past_days: int = None) -> dict:
+    """
+    Query the exit status and summary quantities `names` of all
+    BigDFTCalculations, created in the last `past_days` days if given
+
+    :returns: {name: array} of one float per calculation, NaN where missing,
+        including the `pk` and `exit_status` columns
+    """
+    filters = {"process_type": BigDFTCalculation.build_process_type()}
+    if past_days is not None:
+        filters["ctime"] = {">": timezone.now() - timedelta(days=past_days)}
+    names = sorted(name for name in names if name != "exit_status")
+
+    qb = QueryBuilder()
+    qb.append(CalcJobNode, filters=filters, project=["id", "attributes.exit_status"])
+    calculations = _array(qb, 2)
+    calculations = calculations[np.argsort(calculations[:, 0])]
+
+    # calculations without a summary (e.g. failed ones) have NaN quantities
+    qb = QueryBuilder()
+    qb.append(CalcJobNode, filters=filters, project=["id"], tag="calc")
+    qb.append(
+        Dict,
+        with_incoming="calc",
+        edge_filters={"label": "output_parameters"},
+        project=[f"attributes.{name}" for name in names],
+    )
+    summaries = _array(qb, 1 + len(names))
+    values = np.full((len(calculations), len(names)), np.nan)
+    values[np.searchsorted(calculations[:, 0], summaries[:, 0])] = summaries[:, 1:]
+
+    columns = {"pk": calculations[:, 0], "exit_status": calculations[:, 1]}
+    columns.update({name: values[:, index] for index, name in enumerate(names)})
+    return columns
+
+
+def _array(qb, ncolumns: int):
+    """
+    Return the rows projected by `qb` as an (n, `ncolumns`) float array
+    """
+    rows = np.array(list(qb.iterall(batch_size=1000)), dtype=float)
+    return rows.reshape(-1, ncolumns)
+
+
+def _value(value):
+    """
+    Return a float as a json friendly value: None for NaN, int if integral
+    """
+    if np.isnan(value):
+        return None
+    if float(value).is_integer():
+        return int(value)
+    return float(value)
+
+
+def aggregate(columns: dict, group_by: str, quantities) -> list:
+    """
+    Reduce the `columns` (as returned by `collect`) over the groups of equal
+    `group_by` values
+
+    :returns: a row per group, sorted by group value, of its `count`, the
+        number of `failed` calculations (non zero exit status), and the
+        mean, standard deviation, minimum and maximum of each quantity
+    """
+    groups, inverse, counts = np.unique(
+        columns[group_by], return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    ngroups = len(groups)
+    status = columns["exit_status"]
+    failed = np.bincount(
+        inverse, weights=(status != 0) & ~np.isnan(status), minlength=ngroups
+    )
+
+    rows = [
+        {group_by: _value(group), "count": int(count), "failed": int(fail)}
+        for group, count, fail in zip(groups, counts, failed)
+    ]
+
+    for name in quantities:
+        values = columns[name]
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        number = np.bincount(inverse, weights=valid, minlength=ngroups)
+        total = np.bincount(inverse, weights=filled, minlength=ngroups)
+        squares = np.bincount(inverse, weights=filled**2, minlength=ngroups)
+        minimum = np.full(ngroups, np.inf)
+        np.minimum.at(minimum, inverse[valid], values[valid])
+        maximum = np.full(ngroups, -np.inf)
+        np.maximum.at(maximum, inverse[valid], values[valid])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / number
+            std = np.sqrt(np.maximum(squares / number - mean**2, 0.0))
+        empty = number == 0
+        minimum[empty] = maximum[empty] = np.nan
+
+        for index, row in enumerate(rows):
+            row[f"{name}_mean"] = _value(mean[index])
+            row[f"{name}_std"] = _value(std[index])
+            row[f"{name}_min"] = _value(minimum[index])
+            row[f"{name}_max"] = _value(maximum[index])
+
+    return rows
+
+
+def calculation_stats(
+    group_by: str = "exit_status", quantities=("walltime",), past_days: int = None
+) -> list:
+    """
+    Statistics of the BigDFTCalculations, grouped by `group_by`
+
+    :param group_by: one of `GROUPS`. Grouping by exit status gives the
+        failure rate of each exit code
+    :param quantities: summary quantities (of `STATS_QUANTITIES`) to reduce
+    :param past_days: only include calculations created in the last days
+    :returns: rows as described by `aggregate`, with the `fraction` of all
+        calculations in each group
+    :raises ValueError: for an unknown group or quantity
+    """
+    if group_by not in GROUPS:
+        raise ValueError(f"group_by must be one of {GROUPS}, not '{group_by}'")
+    unknown = set(quantities) - set(STATS_QUANTITIES)
+    if unknown:
+        raise ValueError(f"unknown quantities {sorted(unknown)}")
+
+    columns = collect({group_by, *quantities}, past_days)
+    rows = aggregate(columns, group_by, quantities)
+    total = len(columns["pk"])
+    for row in rows:
+        row["fraction"] = row["count"] / total
+    return rows
+
+
+def format_rows(rows: list, fmt: str = "table") -> str:
+    """
+    Render `rows` of dicts with equal keys as a table, CSV or JSON
+    """
+    if fmt == "json":
+        return json.dumps(rows, indent=2)
+    if not rows:
+        return ""
+    if fmt == "csv":
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return output.getvalue()
+    if fmt == "table":
+        return tabulate(rows, headers="keys", missingval="-")
+    raise ValueError(f"format must be one of {FORMATS}, not '{fmt}'")
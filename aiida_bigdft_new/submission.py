@@ -0,0 +1,165 @@
+"""
+Batched submission of many BigDFT calculations
+
+Usage::
+
+    from aiida_bigdft_new.submission import submit_batch
+
+    report = submit_batch(
+        "bigdft@cluster",
+        ((structure, {"dft": {"hgrids": 0.4}}) for structure in structures),
+        options={"max_wallclock_seconds": 3600},
+        max_active=200,
+    )
+    print(f"{len(report.nodes)} jobs at {report.rate:.1f} jobs/s")
+"""
+from collections import namedtuple
+import time
+
+from aiida.common.hashing import make_hash
+from aiida.common.log import AIIDA_LOGGER
+from aiida.engine import submit
+from aiida.manage import get_manager
+from aiida.orm import AbstractCode, CalcJobNode, QueryBuilder, load_code
+
+from aiida_bigdft_new.calculations import BigDFTCalculation
+from aiida_bigdft_new.data import BigDFTParameters
+
+LOGGER = AIIDA_LOGGER.getChild("bigdft_new.submission")
+
+# process states of calculations which occupy the computer
+ACTIVE_STATES = ("created", "waiting", "running")
+
+BatchReport = namedtuple("BatchReport", ["nodes", "elapsed", "rate"])
+
+
+def count_active(computer) -> int:
+    """
+    Return the number of unfinished calculations on `computer`
+    """
+    query = QueryBuilder().append(
+        CalcJobNode,
+        filters={
+            "dbcomputer_id": computer.pk,
+            "attributes.process_state": {"in": ACTIVE_STATES},
+        },
+    )
+    return query.count()
+
+
+def wait_for_slots(computer, max_active: int, poll_interval: float) -> int:
+    """
+    Block until fewer than `max_active` calculations are active on
+    `computer`, returning the number of free slots
+    """
+    while True:
+        free = max_active - count_active(computer)
+        if free > 0:
+            return free
+        LOGGER.info(f"{max_active} jobs active on {computer.label}, waiting")
+        time.sleep(poll_interval)
+
+
+def _store_inputs(jobs: list):
+    """
+    Store the structures and parameters of `jobs` in a single transaction
+    """
+    with get_manager().get_profile_storage().transaction():
+        for structure, parameters in jobs:
+            if not structure.is_stored:
+                structure.store()
+            if not parameters.is_stored:
+                parameters.store()
+
+
+def _report(nodes: list, start: float) -> BatchReport:
+    """
+    Return the BatchReport of the `nodes` submitted since `start`
+    """
+    elapsed = time.monotonic() - start
+    # a batch may be submitted within the resolution of the clock
+    return BatchReport(nodes, elapsed, len(nodes) / elapsed if elapsed else 0.0)
+
+
+def submit_batch(
+    code,
+    jobs,
+    options: dict = None,
+    max_active: int = None,
+    batch_size: int = 100,
+    poll_interval: float = 30.0,
+    submit_function=submit,
+) -> BatchReport:
+    """
+    Submit a BigDFTCalculation for each (structure, parameters) pair in `jobs`
+
+    The code is loaded once. Jobs are handled in batches of `batch_size`,
+    whose input nodes are stored together in one transaction. If
+    `max_active` is given, submission pauses while that many calculations
+    are active on the code's computer. Throughput is logged after each batch.
+
+    :param code: code, or its label or pk
+    :param jobs: iterable of (StructureData, parameters) pairs, where the
+        parameters are either BigDFTParameters or a dict. Equal dicts are
+        stored as a single node
+    :param options: metadata options shared by all calculations
+    :param max_active: maximum number of active calculations on the computer
+    :param batch_size: number of jobs stored and submitted together
+    :param poll_interval: seconds between checks of the number of active jobs
+    :param submit_function: callable(process_class, **inputs) used to launch
+        each calculation, e.g. `aiida.engine.run_get_node` to run them locally
+    :returns: BatchReport of the submitted nodes, elapsed seconds and the
+        rate in jobs per second
+    """
+    if not isinstance(code, AbstractCode):
+        code = load_code(code)
+    computer = code.computer
+    if max_active is not None and computer is None:
+        raise ValueError(f"can not throttle jobs of {code.label}, it has no computer")
+    options = dict(options or {})
+
+    # identical parameter dicts share a single node
+    parameter_nodes = {}
+
+    nodes = []
+    start = time.monotonic()
+    batch = []
+    jobs = iter(jobs)
+    while True:
+        batch.clear()
+        for structure, parameters in jobs:
+            if not isinstance(parameters, BigDFTParameters):
+                key = make_hash(parameters)
+                if key not in parameter_nodes:
+                    parameter_nodes[key] = BigDFTParameters(parameters)
+                parameters = parameter_nodes[key]
+            batch.append((structure, parameters))
+            if len(batch) == batch_size:
+                break
+        if not batch:
+            break
+
+        _store_inputs(batch)
+
+        free = None
+        for structure, parameters in batch:
+            if max_active is not None:
+                free = free or wait_for_slots(computer, max_active, poll_interval)
+                free -= 1
+            nodes.append(
+                submit_function(
+                    BigDFTCalculation,
+                    code=code,
+                    structure=structure,
+                    parameters=parameters,
+                    metadata={"options": options},
+                )
+            )
+
+        report = _report(nodes, start)
+        LOGGER.report(
+            f"submitted {len(nodes)} jobs in {report.elapsed:.1f}s "
+            f"({report.rate:.2f} jobs/s)"
+        )
+
+    return _report(nodes, start)
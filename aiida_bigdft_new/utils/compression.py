@@ -0,0 +1,214 @@
+"""
+Streaming compression of file contents
+
+Contents are copied in chunks of `CHUNK_SIZE` bytes, compressing them on the
+fly, so files of any size are handled in constant memory. Compressed
+contents are read back through a seekable decompressing reader. gzip is
+always available, zstd requires the `zstandard` package (the `zstd` extra).
+"""
+
+import contextlib
+import gzip
+import io
+import shutil
+import tempfile
+
+CHUNK_SIZE = 2**20
+# zlib level of gzip compression, trading ratio for speed
+GZIP_LEVEL = 6
+
+# suffix of the files written with each compression
+SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+COMPRESSIONS = tuple(SUFFIXES)
+
+
+def _zstandard():
+    """
+    Import the optional zstandard package
+    """
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as exception:
+        raise ValueError(
+            "zstd compression requires the zstandard package, "
+            "install aiida-bigdft-new[zstd]"
+        ) from exception
+    return zstandard
+
+
+def check_compression(compression: str):
+    """
+    Check that `compression` is one of `COMPRESSIONS`
+
+    :raises ValueError: for an unknown compression
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"compression must be one of {COMPRESSIONS}, not '{compression}'"
+        )
+
+
+def compressed_name(name: str, compression: str) -> str:
+    """
+    Return the name of file `name` compressed with `compression`
+
+    :raises ValueError: for an unknown compression
+    """
+    check_compression(compression)
+    return name + SUFFIXES[compression]
+
+
+@contextlib.contextmanager
+def compressed_writer(handle, compression: str = "none"):
+    """
+    Context manager wrapping the binary `handle` in a writer compressing
+    with `compression`
+
+    Closing the writer flushes the compressed stream, but leaves `handle`
+    open
+
+    :raises ValueError: for an unknown or unavailable compression
+    """
+    check_compression(compression)
+
+    if compression == "none":
+        yield handle
+        return
+
+    if compression == "gzip":
+        # no timestamp, so that equal contents compress to equal bytes
+        writer = gzip.GzipFile(
+            fileobj=handle, mode="wb", compresslevel=GZIP_LEVEL, mtime=0
+        )
+    else:
+        writer = _zstandard().ZstdCompressor().stream_writer(handle, closefd=False)
+    with writer:
+        yield writer
+
+
+def copy_compressed(source, handle, compression: str = "none", chunk_size=CHUNK_SIZE):
+    """
+    Copy the binary stream `source` to the binary `handle` in chunks,
+    compressing with `compression`
+    """
+    with compressed_writer(handle, compression) as writer:
+        shutil.copyfileobj(source, writer, chunk_size)
+
+
+def compressed_copy(source, compression: str, chunk_size=CHUNK_SIZE):
+    """
+    Return a temporary binary file holding the binary stream `source`
+    compressed with `compression`, positioned at its start
+    """
+    copy = tempfile.TemporaryFile()
+    try:
+        copy_compressed(source, copy, compression, chunk_size)
+    except BaseException:
+        copy.close()
+        raise
+    copy.seek(0)
+    return copy
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Seekable binary reader over the decompressed content of a stream
+
+    Decompression streams can only be read forwards: seeking forwards reads
+    and discards the content in between, seeking backwards restarts from
+    the beginning of the stream
+
+    :param opener: callable returning a context manager for the compressed
+        binary handle
+    :param compression: compression of the stream, other than "none"
+    """
+
+    def __init__(self, opener, compression: str):
+        super().__init__()
+        check_compression(compression)
+        self._opener = opener
+        self._compression = compression
+        self._stack = None
+        self._stream = None
+        self._position = 0
+        self._restart()
+
+    def _restart(self):
+        """
+        (Re)open the compressed stream at its beginning
+        """
+        self._close_stream()
+        self._stack = contextlib.ExitStack()
+        handle = self._stack.enter_context(self._opener())
+        if self._compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=handle, mode="rb")
+        else:
+            decompressor = _zstandard().ZstdDecompressor()
+            self._stream = decompressor.stream_reader(handle, closefd=False)
+        self._stack.callback(self._stream.close)
+        self._position = 0
+
+    def _close_stream(self):
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            self._skip(None)
+            offset += self._position
+        if offset < self._position:
+            self._restart()
+        self._skip(offset - self._position)
+        return self._position
+
+    def _skip(self, length):
+        """
+        Read and discard `length` bytes, or up to the end if None, returning
+        the number of bytes skipped
+        """
+        skipped = 0
+        while length is None or skipped < length:
+            size = CHUNK_SIZE if length is None else min(CHUNK_SIZE, length - skipped)
+            data = self._stream.read(size)
+            if not data:
+                break
+            skipped += len(data)
+        self._position += skipped
+        return skipped
+
+    def close(self):
+        self._close_stream()
+        super().close()
+
+
+@contextlib.contextmanager
+def open_decompressed(opener, compression: str, mode: str = "rb"):
+    """
+    Context manager for a buffered handle over the decompressed content of
+    the stream returned by `opener`, in text (`mode="r"`) or binary mode
+    """
+    with contextlib.ExitStack() as stack:
+        if compression == "none":
+            reader = stack.enter_context(opener())
+        else:
+            raw = DecompressingReader(opener, compression)
+            reader = stack.enter_context(io.BufferedReader(raw, CHUNK_SIZE))
+        yield reader if "b" in mode else io.TextIOWrapper(reader, encoding="utf8")
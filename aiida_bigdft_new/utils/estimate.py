@@ -0,0 +1,101 @@
+"""
+Resource estimates from a BigDFT memory estimation (dry) run
+
+`bigdft-tool -a memory-estimation` sets up the calculation for a given
+number of MPI processes, without running it, and writes the estimated peak
+memory per process and the size of the grids to its logfile.
+"""
+
+from collections.abc import Mapping
+import functools
+import math
+import operator
+
+from aiida_bigdft_new.utils.summary import follow_path
+
+# quantities read from the logfile, as {name: path}
+ESTIMATE_QUANTITIES = {
+    "memory_peak": ["Estimated Memory Peak (MB)"],
+    "grid_points": ["Sizes of the simulation domain", "Grid Spacing Units"],
+    "box_size": ["Sizes of the simulation domain", "AU"],
+    "grid_spacing": ["Box Grid spacings"],
+    "nat": ["Atomic System Properties", "Number of atoms"],
+    "number_of_electrons": ["Total Number of Electrons"],
+    "number_of_orbitals": ["Total Number of Orbitals"],
+}
+
+
+def estimate_mpiprocs(options) -> int:
+    """
+    Number of MPI processes the memory is estimated for in a dry run, given
+    the calculation's options
+    """
+    if options.get("estimate_mpiprocs") is not None:
+        return options["estimate_mpiprocs"]
+    resources = options.get("resources") or {}
+    return resources.get("num_machines", 1) * resources.get(
+        "num_mpiprocs_per_machine", 1
+    )
+
+
+def extract_estimate(content: Mapping, mpiprocs: int) -> dict:
+    """
+    Extract the estimate from the (first document) `content` of the logfile
+    of a memory estimation for `mpiprocs` MPI processes
+
+    Only the needed top level sections are accessed, so a lazily loaded
+    content will not parse the rest of the file
+
+    :raises ValueError: if the logfile contains no memory estimate
+    """
+    estimate = {"mpiprocs": mpiprocs}
+    for name, path in ESTIMATE_QUANTITIES.items():
+        if path[0] not in content:
+            continue
+        value = follow_path(content, path)
+        if value is not None:
+            estimate[name] = value
+
+    if "memory_peak" not in estimate:
+        raise ValueError("the logfile contains no memory estimate")
+    if "grid_points" in estimate:
+        estimate["total_grid_points"] = functools.reduce(
+            operator.mul, estimate["grid_points"], 1
+        )
+    return estimate
+
+
+def suggest_resources(
+    estimate: Mapping,
+    memory_per_machine: float,
+    mpiprocs_per_machine: int,
+    safety: float = 1.2,
+) -> dict:
+    """
+    Choose the resources for running `estimate["mpiprocs"]` MPI processes
+
+    Processes are packed onto as few machines as their estimated peak
+    memory (with a `safety` factor) allows
+
+    :param estimate: output of a memory estimation, see `extract_estimate`
+    :param memory_per_machine: memory available on each machine, in MB
+    :param mpiprocs_per_machine: maximum number of processes per machine
+    :param safety: factor applied to the estimated peak memory
+    :returns: `resources` option, with `num_machines` and
+        `num_mpiprocs_per_machine`
+    :raises ValueError: if a single process does not fit on a machine
+    """
+    per_process = float(estimate["memory_peak"]) * safety
+    fits = int(memory_per_machine // per_process) if per_process > 0 else math.inf
+    if fits < 1:
+        raise ValueError(
+            f"a single process needs {per_process:.0f} MB, "
+            f"more than the {memory_per_machine:.0f} MB of a machine"
+        )
+
+    mpiprocs = int(estimate["mpiprocs"])
+    per_machine = min(fits, mpiprocs_per_machine, mpiprocs)
+    return {
+        "num_machines": math.ceil(mpiprocs / per_machine),
+        "num_mpiprocs_per_machine": per_machine,
+    }
@@ -0,0 +1,43 @@
+"""
+Export of node contents to files, in chunks and optionally compressed
+
+The files of SinglefileData nodes (logfiles, timing files) are streamed from
+the repository, so nodes of any size are exported in constant memory. Other
+nodes, such as parameters, are exported as their string form.
+"""
+
+import io
+
+from aiida.orm import SinglefileData
+
+from aiida_bigdft_new.utils.compression import compressed_name, copy_compressed
+
+
+def node_stream(node):
+    """
+    Return a binary stream of the content of `node`: the file of a
+    SinglefileData, the string form of other nodes
+    """
+    if isinstance(node, SinglefileData):
+        return node.open(mode="rb")
+    return io.BytesIO(f"{node}\n".encode())
+
+
+def export_name(node, compression: str = "none") -> str:
+    """
+    Name of the file `node` is exported to, after its pk
+    """
+    if isinstance(node, SinglefileData):
+        name = f"{node.pk}-{node.filename}"
+    else:
+        name = f"{node.pk}.txt"
+    return compressed_name(name, compression)
+
+
+def export_node(node, handle, compression: str = "none"):
+    """
+    Write the content of `node` to the binary `handle`, compressed with
+    `compression`
+    """
+    with node_stream(node) as source:
+        copy_compressed(source, handle, compression)
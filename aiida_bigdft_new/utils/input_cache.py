@@ -0,0 +1,110 @@
+"""
+Content addressed reuse of the generated input files
+
+Inputs are identified by the AiiDA hashes of the structure and parameters
+nodes. Within a process, the converted posinp and the rendered input are
+held in bounded LRU caches, so an identical (structure, parameters) pair is
+only converted and rendered once.
+
+Cached values are shared, and must not be modified.
+"""
+
+from collections import OrderedDict
+
+from aiida.common.hashing import make_hash
+
+CACHE_SIZE = 128
+
+
+class LRUCache:
+    """
+    A mapping holding at most `maxsize` items, dropping the least recently
+    used first
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Return the value of `key`, marking it as recently used
+        """
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key, value):
+        """
+        Set the value of `key`, dropping the least recently used if full
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Remove `key`, returning its value
+        """
+        return self._data.pop(key, default)
+
+    def clear(self):
+        """
+        Remove all items
+        """
+        self._data.clear()
+
+
+_posinp = LRUCache()
+_rendered = LRUCache()
+
+
+def clear_caches():
+    """
+    Empty the in-process caches
+    """
+    for cache in (_posinp, _rendered):
+        cache.clear()
+
+
+def input_hash(structure, parameters, overrides: dict = None) -> str:
+    """
+    Return the hash identifying the input rendered from this structure and
+    these parameters, with the `overrides` set by the calculation
+    """
+    return make_hash(
+        [
+            structure.base.caching.get_hash(),
+            parameters.base.caching.get_hash(),
+            overrides or {},
+        ]
+    )
+
+
+def cached_posinp(structure, convert) -> dict:
+    """
+    Return the posinp of `structure`, calling `convert(structure)` on a miss
+    """
+    key = structure.base.caching.get_hash()
+    posinp = _posinp.get(key)
+    if posinp is None:
+        posinp = convert(structure)
+        _posinp.set(key, posinp)
+    return posinp
+
+
+def cached_input(key: str, render) -> str:
+    """
+    Return the rendered input text for `key`, calling `render()` on a miss
+    """
+    text = _rendered.get(key)
+    if text is None:
+        text = render()
+        _rendered.set(key, text)
+    return text
@@ -0,0 +1,135 @@
+"""
+Bounded worker pools for the heavy part of parsing
+
+Extracting the summary from a logfile and the columns from a timefile means
+parsing (possibly very large) yaml files. Done inline, this blocks the
+daemon worker which runs the parser. With a pool, the logfile and timefile
+are parsed concurrently, and only the compact results (a flat dict and a
+handful of numpy arrays) are passed back to the worker.
+
+Two kinds of pool are available:
+
+ - `thread`: cheap to start, but shares the GIL with the worker, so mainly
+   overlaps reading the repository files
+ - `process`: the pool processes load the worker's profile on start. Fully
+   parallel, and the memory used by parsing is not held by the daemon worker
+
+In both cases the pool is only given the uuids of the stored nodes, which it
+loads itself: database sessions are not shared between threads.
+
+One pool of each kind is created per interpreter, on first use, and reused
+by all subsequent parses. Its size is fixed at creation.
+"""
+
+import concurrent.futures
+import multiprocessing
+
+from aiida.manage import get_manager
+from aiida.orm import load_node
+
+from aiida_bigdft_new.data.BigDFTTiming import timing_columns
+from aiida_bigdft_new.utils.summary import extract_summary
+
+try:
+    from plumpy.greenback_bridge import has_portal, sync_await
+except ImportError:  # older plumpy, waiting blocks the event loop
+    has_portal = None
+
+POOL_TYPES = ("thread", "process")
+
+_pools = {}
+
+
+def _initialise_process(profile_name):
+    """
+    Load the parent's profile in a freshly spawned pool process
+    """
+    from aiida import load_profile  # pylint: disable=import-outside-toplevel
+
+    load_profile(profile_name, allow_switch=True)
+
+
+def get_pool(pool_type: str = "process", workers: int = 1):
+    """
+    Return the pool of type `pool_type`, creating it with `workers` workers
+    if it does not exist yet
+
+    :raises ValueError: for an unknown pool type
+    """
+    if pool_type not in POOL_TYPES:
+        raise ValueError(f"pool type must be one of {POOL_TYPES}, not '{pool_type}'")
+
+    if pool_type not in _pools:
+        if pool_type == "thread":
+            pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="bigdft-parser"
+            )
+        else:
+            # daemon workers run an event loop and hold database connections,
+            # neither of which survives a fork
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialise_process,
+                initargs=(get_manager().get_profile().name,),
+            )
+        _pools[pool_type] = pool
+    return _pools[pool_type]
+
+
+def shutdown_pools(wait: bool = True):
+    """
+    Shut down all pools, which will be recreated when next used
+    """
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.shutdown(wait=wait)
+
+
+def logfile_summary(uuid: str) -> dict:
+    """
+    Extract the summary of the BigDFTLogfile with this uuid
+    """
+    return extract_summary(load_node(uuid).content)
+
+
+def timefile_columns(uuid: str) -> tuple:
+    """
+    Extract the timing columns of the timefile with this uuid
+    """
+    return timing_columns(load_node(uuid).content)
+
+
+def wait(futures: list) -> list:
+    """
+    Wait for `futures`, returning their results in order
+
+    When called from a running process (within the daemon) the event loop is
+    allowed to advance other processes while waiting
+    """
+    if has_portal is not None and has_portal():
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        sync_await(asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+    return [future.result() for future in futures]
+
+
+def parse_concurrently(
+    logfile=None, timefile=None, pool_type: str = "process", workers: int = 1
+) -> tuple:
+    """
+    Extract the logfile summary and timefile columns concurrently
+
+    :param logfile: stored BigDFTLogfile, or None
+    :param timefile: stored timefile, or None
+    :returns: (summary, columns), either of which is None if the
+        corresponding file was not given
+    """
+    pool = get_pool(pool_type, workers)
+    tasks = [(logfile_summary, logfile), (timefile_columns, timefile)]
+    submitted = [
+        pool.submit(function, node.uuid) if node is not None else None
+        for function, node in tasks
+    ]
+    results = iter(wait([future for future in submitted if future is not None]))
+    return tuple(None if future is None else next(results) for future in submitted)
@@ -0,0 +1,121 @@
+"""
+Reading and writing of BigDFT format structures, such as the forces_posinp.yaml
+file written at the end of a run
+"""
+
+from BigDFT.Atoms import AU_to_A
+import numpy as np
+
+# conversion factors to angstroem
+UNITS = {
+    "angstroem": 1.0,
+    "angstrom": 1.0,
+    "atomic": AU_to_A,
+    "bohr": AU_to_A,
+    "reduced": AU_to_A,  # reduced positions refer to a cell in atomic units
+}
+
+
+def split_atoms(atoms: list) -> tuple:
+    """
+    Split a BigDFT list of `{symbol: [x, y, z], ...}` dicts into a list of
+    symbols and an (n, 3) array of the vectors
+    """
+    symbols = []
+    vectors = []
+    for atom in atoms:
+        for key, value in atom.items():
+            if isinstance(value, list):
+                symbols.append(key)
+                vectors.append(value)
+                break
+    return symbols, np.array(vectors, dtype=float).reshape(-1, 3)
+
+
+def read_cell(content: dict):
+    """
+    Return the (3, 3) cell of a posinp dict in its own units, and the
+    periodicity along each direction. Free directions have zero length
+    """
+    if "abc" in content:
+        cell = np.array(content["abc"], dtype=float)
+    elif "cell" in content:
+        cell = np.diag([float(length) for length in content["cell"]])
+    else:
+        return None, (False, False, False)
+
+    finite = np.isfinite(cell)
+    cell[~finite] = 0.0
+    return cell, tuple(bool(f) for f in finite.all(axis=1))
+
+
+def read_posinp(content: dict) -> dict:
+    """
+    Read a BigDFT yaml structure (positions and, where present, forces)
+
+    :param content: loaded posinp dict
+    :returns: dict of `symbols`, `positions` and `cell` (angstroem), `pbc`,
+        and if present `forces` (Ha/Bohr) and `energy` (Ha)
+    """
+    units = str(content.get("units", "atomic")).lower()
+    if units not in UNITS:
+        raise ValueError(f"unknown posinp units '{units}'")
+    scale = UNITS[units]
+
+    symbols, positions = split_atoms(content.get("positions", []))
+    cell, pbc = read_cell(content)
+
+    if units == "reduced":
+        if cell is None:
+            raise ValueError("reduced positions require a cell")
+        positions = positions @ cell
+    positions *= scale
+
+    result = {
+        "symbols": symbols,
+        "positions": positions,
+        "cell": None if cell is None else cell * scale,
+        "pbc": pbc,
+    }
+
+    for key, value in content.items():
+        if str(key).startswith("forces"):
+            result["forces"] = split_atoms(value)[1]
+            break
+
+    properties = content.get("properties", {}) or {}
+    for source in (content, properties):
+        if "energy (Ha)" in source:
+            result["energy"] = float(source["energy (Ha)"])
+            break
+
+    return result
+
+
+def posinp_to_xyz(posinp: dict) -> str:
+    """
+    Render a posinp dict (as built by `structure_to_posinp`) in BigDFT's xyz
+    format
+
+    :raises ValueError: if the cell is not orthorhombic, which xyz can not
+        represent
+    """
+    symbols, positions = split_atoms(posinp["positions"])
+    lines = [f"{len(symbols)} {posinp.get('units', 'atomic')}"]
+
+    cell = posinp.get("abc")
+    if cell is None:
+        lines.append("free")
+    else:
+        cell = np.asarray(cell, dtype=float)
+        if np.count_nonzero(cell - np.diag(np.diagonal(cell))):
+            raise ValueError("xyz posinp requires an orthorhombic cell")
+        lines.append(
+            "periodic " + " ".join(repr(v) for v in np.diagonal(cell).tolist())
+        )
+
+    lines.extend(
+        f"{symbol} {x!r} {y!r} {z!r}"
+        for symbol, (x, y, z) in zip(symbols, positions.tolist())
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+"""
+Reduction of a BigDFT logfile on the compute node, before retrieval
+
+This script is copied to the calculation folder and run after BigDFT by the
+job script, so it only depends on the standard library of any Python 3::
+
+    python3 reduce_log.py reduce_log.json
+
+The json configuration gives the `logfile`, the top level `sections` to keep
+and the glob patterns of other files to `compress`. The full logfile is
+gzipped to `<logfile>.gz`, then replaced by a logfile holding only the kept
+sections of each document (and the sections defining anchors they refer to).
+The logfile is split into sections in a single streaming pass, without
+parsing yaml, and the kept sections are then copied byte for byte.
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+
+CHUNK_SIZE = 2**20
+GZIP_SUFFIX = ".gz"
+
+ANCHOR = re.compile(r"&([^\s,\[\]{}]+)")
+ALIAS = re.compile(r"\*([^\s,\[\]{}]+)")
+
+
+def gzip_file(path):
+    """
+    Compress the file `path` to `path.gz` in chunks, keeping the original
+    """
+    with open(path, "rb") as source, open(path + GZIP_SUFFIX, "wb") as handle:
+        # no timestamp, so that equal contents compress to equal bytes
+        with gzip.GzipFile(fileobj=handle, mode="wb", mtime=0) as writer:
+            shutil.copyfileobj(source, writer, CHUNK_SIZE)
+
+
+def scan_line(line, state):
+    """
+    Strip the quoted strings and comment of `line`, updating the flow
+    collection depth and open quote of `state` across lines
+
+    :returns: the plain (unquoted, uncommented) text of the line
+    """
+    plain = []
+    previous = " "
+    escaped = False
+    for char in line:
+        if state["quote"]:
+            if escaped:
+                escaped = False
+            elif char == "\\" and state["quote"] == '"':
+                escaped = True
+            elif char == state["quote"]:
+                state["quote"] = None
+        elif char in "\"'" and previous in " ,[{:-":
+            state["quote"] = char
+        elif char == "#" and previous.isspace():
+            break
+        else:
+            if char in "[{":
+                state["depth"] += 1
+            elif char in "]}":
+                state["depth"] -= 1
+            plain.append(char)
+        previous = char
+    return "".join(plain)
+
+
+def top_level_key(line, indent):
+    """
+    Return the key of a top level mapping `line`, None for other lines
+    """
+    stripped = line.lstrip(" ")
+    if len(line) - len(stripped) != indent or stripped[:1] in "#-[{\"'":
+        return None
+    key, separator, _ = stripped.partition(":")
+    if not separator or not key.strip():
+        return None
+    return key.strip()
+
+
+def scan_sections(handle):
+    """
+    Split the binary logfile `handle` into top level sections
+
+    :returns: list of sections, as dicts of their `key` (None for document
+        separators and other lines outside a section), `document` index,
+        `start` and `end` offsets, and the `anchors` and `aliases` they hold
+    """
+    sections = []
+    state = {"depth": 0, "quote": None}
+    document = 0
+    indent = None
+    offset = 0
+    for raw in handle:
+        line = raw.decode("utf8", errors="replace").rstrip("\r\n")
+        at_top = state["depth"] == 0 and state["quote"] is None
+        if at_top and line in ("---", "..."):
+            if line == "---" and sections:
+                document += 1
+            indent = None
+            sections.append(_section(None, document, offset))
+        else:
+            key = None
+            if at_top and line.strip() and not line.lstrip().startswith("#"):
+                if indent is None:
+                    indent = len(line) - len(line.lstrip(" "))
+                key = top_level_key(line, indent)
+            if key is not None or not sections:
+                sections.append(_section(key, document, offset))
+            plain = scan_line(line, state)
+            sections[-1]["anchors"].update(ANCHOR.findall(plain))
+            sections[-1]["aliases"].update(ALIAS.findall(plain))
+        offset += len(raw)
+        sections[-1]["end"] = offset
+    return sections
+
+
+def _section(key, document, start):
+    return {
+        "key": key,
+        "document": document,
+        "start": start,
+        "end": start,
+        "anchors": set(),
+        "aliases": set(),
+    }
+
+
+def select_sections(sections, keys):
+    """
+    Return the indices of the `sections` to keep: those of `keys`, the
+    document separators, and those defining the anchors of kept sections
+    """
+    kept = {
+        index
+        for index, section in enumerate(sections)
+        if section["key"] is None or section["key"] in keys
+    }
+    missing = True
+    while missing:
+        missing = False
+        aliases = {
+            (sections[index]["document"], alias)
+            for index in kept
+            for alias in sections[index]["aliases"]
+        }
+        for index, section in enumerate(sections):
+            anchors = {(section["document"], anchor) for anchor in section["anchors"]}
+            if index not in kept and anchors & aliases:
+                kept.add(index)
+                missing = True
+    return sorted(kept)
+
+
+def reduce_log(path, keys):
+    """
+    Replace the logfile `path` by its sections of `keys`
+
+    The reduced logfile is written aside first, so that the original is left
+    untouched if anything fails
+    """
+    with open(path, "rb") as handle:
+        sections = scan_sections(handle)
+        kept = select_sections(sections, set(keys))
+        with open(path + ".part", "wb") as output:
+            for index in kept:
+                handle.seek(sections[index]["start"])
+                length = sections[index]["end"] - sections[index]["start"]
+                output.write(handle.read(length))
+    os.replace(path + ".part", path)
+
+
+def main(argv):
+    """
+    Reduce the logfile and compress the files of the configuration `argv[1]`
+    """
+    with open(argv[1]) as handle:
+        config = json.load(handle)
+
+    logfile = config["logfile"]
+    if os.path.isfile(logfile):
+        gzip_file(logfile)
+        reduce_log(logfile, config["sections"])
+
+    for pattern in config.get("compress", []):
+        for path in glob.glob(pattern):
+            if not path.endswith(GZIP_SUFFIX):
+                gzip_file(path)
+                os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,169 @@
+"""
+Single pass scanning of the scheduler stderr for common failures
+
+All registered patterns are combined into one precompiled alternation, and
+the stderr is read in fixed size chunks so that memory use is bounded
+whatever its size. Optionally only the tail of the file is scanned.
+
+Patterns are mapped to the label of an exit code of the calculation. Sites
+can add their own, either by calling `register_stderr_pattern`, or through
+the `aiida_bigdft_new.stderr_patterns` entry point group, whose entry points
+should each be a list of `(pattern, exit_code_label)` tuples, e.g.
+
+    [project.entry-points."aiida_bigdft_new.stderr_patterns"]
+    mysite = "mysite.patterns:STDERR_PATTERNS"
+
+When several patterns match, the one registered first takes precedence.
+Since patterns are combined, they can not use global inline flags such as
+`(?i)` (use a scoped `(?i:...)` instead) nor numbered backreferences (use
+named groups instead).
+"""
+
+import functools
+import io
+import re
+import sys
+import warnings
+
+# selecting entry points by group requires python 3.10, or the backport
+if sys.version_info >= (3, 10):
+    from importlib.metadata import entry_points
+else:
+    from importlib_metadata import entry_points
+
+ENTRY_POINT_GROUP = "aiida_bigdft_new.stderr_patterns"
+
+DEFAULT_PATTERNS = [
+    # timeouts
+    ("DUE TO TIME LIMIT", "ERROR_OUT_OF_WALLTIME"),  # slurm
+    ("exceeded hard wallclock time", "ERROR_OUT_OF_WALLTIME"),  # UGE
+    ("TERM_RUNLIMIT: job killed", "ERROR_OUT_OF_WALLTIME"),  # LFS
+    ("walltime .* exceeded limit", "ERROR_OUT_OF_WALLTIME"),  # PBS/Torque
+    # out of memory
+    ("[oO]ut [oO]f [mM]emory", "ERROR_OUT_OF_MEMORY"),
+    ("oom-kill", "ERROR_OUT_OF_MEMORY"),  # generic OOM messages
+    ("Exceeded .* memory limit", "ERROR_OUT_OF_MEMORY"),  # slurm
+    ("exceeds job hard limit .*mem.* of queue", "ERROR_OUT_OF_MEMORY"),  # UGE
+    (
+        "TERM_MEMLIMIT: job killed after reaching LSF memory usage limit",
+        "ERROR_OUT_OF_MEMORY",
+    ),  # LFS
+    ("mem .* exceeded limit", "ERROR_OUT_OF_MEMORY"),  # PBS/Torque
+]
+
+CHUNK_SIZE = 1024 * 1024
+# a match may span chunks only within this many bytes of the same line
+MAX_LINE_LENGTH = 4096
+
+# a backslash escaped digit, or a conditional on a group number
+NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d)")
+
+_registry = list(DEFAULT_PATTERNS)
+_entry_points_loaded = False
+
+
+def register_stderr_pattern(pattern: str, exit_code: str):
+    """
+    Register a regular expression, mapping it to an exit code label
+
+    Patterns are matched within a single line of stderr
+
+    :param pattern: regular expression, as a str
+    :param exit_code: label of the calculation exit code, e.g.
+        `ERROR_OUT_OF_MEMORY`
+    :raises re.error: if the pattern is invalid, or can not be combined with
+        the others
+    """
+    if NUMBERED_REFERENCE.search(pattern):
+        raise re.error("numbered backreferences are not supported", pattern)
+    with warnings.catch_warnings():
+        # global flags within the pattern only warn before python 3.11
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            _matcher(((pattern, exit_code),))
+        except DeprecationWarning as exception:
+            raise re.error(str(exception), pattern) from exception
+    _registry.append((pattern, exit_code))
+
+
+def registered_patterns() -> list:
+    """
+    Return all registered `(pattern, exit_code_label)`, in order of precedence
+    """
+    global _entry_points_loaded  # pylint: disable=global-statement
+
+    if not _entry_points_loaded:
+        _entry_points_loaded = True
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            for pattern, exit_code in entry_point.load():
+                register_stderr_pattern(pattern, exit_code)
+
+    return list(_registry)
+
+
+@functools.lru_cache(maxsize=8)
+def _matcher(patterns: tuple):
+    """
+    Compile `patterns` into a single bytes regex, with one named group
+    `_<index>` per pattern
+    """
+    return re.compile(
+        b"|".join(
+            b"(?P<_%d>%s)" % (index, pattern.encode("utf8"))
+            for index, (pattern, _) in enumerate(patterns)
+        )
+    )
+
+
+def _chunks(handle, chunk_size: int, tail: int):
+    """
+    Yield chunks of bytes from `handle`, starting `tail` bytes from the end
+    """
+    if tail:
+        try:
+            handle.seek(-tail, io.SEEK_END)
+        except (OSError, ValueError):
+            # not seekable, or shorter than the tail
+            try:
+                handle.seek(0)
+            except (OSError, ValueError, io.UnsupportedOperation):
+                pass
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk.encode("utf8") if isinstance(chunk, str) else chunk
+
+
+def scan_stderr(stderr, tail: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Scan stderr for the registered patterns in a single pass
+
+    :param stderr: file handle (binary or text) or str of the stderr
+    :param tail: only scan this many bytes from the end of the file
+    :param chunk_size: size of the chunks read from the file
+    :returns: the exit code label of the highest precedence matching
+        pattern, or None
+    """
+    if isinstance(stderr, (str, bytes)):
+        stderr = io.BytesIO(
+            stderr.encode("utf8") if isinstance(stderr, str) else stderr
+        )
+
+    patterns = tuple(registered_patterns())
+    if not patterns:
+        return None
+    matcher = _matcher(patterns)
+
+    best = len(patterns)
+    carry = b""
+    for chunk in _chunks(stderr, chunk_size, tail):
+        text = carry + chunk
+        for match in matcher.finditer(text):
+            best = min(best, int(match.lastgroup[1:]))
+        if best == 0:
+            break
+        # keep the incomplete last line, so matches can span chunks
+        carry = text[text.rfind(b"\n") + 1 :][-MAX_LINE_LENGTH:]
+
+    return patterns[best][1] if best < len(patterns) else None
@@ -0,0 +1,111 @@
+"""
+Extraction of a compact summary of key results from a BigDFT logfile
+
+The summary is a flat dict of scalars, suitable for storing as a `Dict` node
+so that results can be filtered and projected within the database. Units are
+those of the logfile: energies in Hartree, forces in Ha/Bohr, memory in MB
+and walltime in seconds.
+"""
+
+from collections.abc import Mapping
+
+from BigDFT.Logfiles import BUILTIN, PATH
+
+from aiida_bigdft_new.utils import yaml_backend
+
+# quantities whose paths are taken from BigDFT's own Logfile definitions
+BUILTIN_QUANTITIES = (
+    "energy",
+    "fermi_level",
+    "forcemax",
+    "nat",
+    "number_of_orbitals",
+    "memory_peak",
+    "magnetization",
+    "symmetry",
+)
+
+# additional quantities, as {name: [path, ...]}
+EXTRA_QUANTITIES = {
+    "infocode": [["BigDFT infocode"]],
+    # parallel layout of the run
+    "mpi_tasks": [["Number of MPI tasks"]],
+    "omp_threads": [["Maximal OpenMP threads per MPI task"]],
+    "walltime": [["Walltime since initialization"]],
+    "memory_used": [
+        ["Memory Consumption Report", "Memory occupation", "Peak Value (MB)"]
+    ],
+}
+
+QUANTITIES = {
+    **{name: BUILTIN[name][PATH] for name in BUILTIN_QUANTITIES},
+    **EXTRA_QUANTITIES,
+}
+
+# top level sections of the logfile which are required to build the summary
+SUMMARY_SECTIONS = sorted({path[0] for paths in QUANTITIES.values() for path in paths})
+
+
+def follow_path(content, path):
+    """
+    Follow the sequence of keys and indices `path` through `content`,
+    returning None if any level is missing
+    """
+    value = content
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+def to_seconds(value):
+    """
+    Convert a walltime to seconds
+
+    Yaml 1.1 parsers read BigDFT's `hh:mm:ss.s` walltimes as sexagesimal
+    floats, but others leave them as strings
+    """
+    if isinstance(value, str):
+        seconds = 0.0
+        for part in value.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    return float(value)
+
+
+def extract_summary(content: Mapping) -> dict:
+    """
+    Extract the summary quantities from the (first document) `content` of a
+    logfile. Quantities which are not present in the logfile are omitted, as
+    are those of sections which can not be parsed, such as the last section
+    of a run killed while writing it
+
+    Only the sections in SUMMARY_SECTIONS are accessed, so a lazily loaded
+    content will not parse the rest of the file. They are preloaded together
+    if the content supports it, see `LazyYamlMapping.preload`
+    """
+    if hasattr(content, "preload"):
+        content.preload(SUMMARY_SECTIONS)
+    summary = {}
+    broken = set()
+    for name, paths in QUANTITIES.items():
+        for path in paths:
+            if path[0] not in content or path[0] in broken:
+                continue
+            try:
+                value = follow_path(content, path)
+            except yaml_backend.errors():
+                broken.add(path[0])
+                continue
+            if value is not None:
+                summary[name] = value
+                break
+
+    if "walltime" in summary:
+        summary["walltime"] = to_seconds(summary["walltime"])
+    if "infocode" in summary:
+        summary["converged"] = summary["infocode"] == 0
+
+    return summary
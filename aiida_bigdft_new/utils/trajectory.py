@@ -0,0 +1,113 @@
+"""
+Trajectories of geometry optimisation and molecular dynamics runs
+
+BigDFT writes one logfile document per step, and optionally a
+`data/posout_<step>.yaml` structure file. Steps are read one at a time, into
+arrays allocated once for the whole run, so a long run is never held in
+memory as yaml.
+"""
+
+import itertools
+
+import numpy as np
+
+from aiida_bigdft_new.utils import yaml_backend
+from aiida_bigdft_new.utils.posinp import read_posinp, split_atoms
+
+# logfile sections holding the structure, forces and energy of a step
+STRUCTURE_KEYS = ("Atomic structure", "posinp")
+FORCES_KEY = "Atomic Forces (Ha/Bohr)"
+ENERGY_KEY = "Energy (Hartree)"
+
+
+def logfile_steps(logfile):
+    """
+    Generator over the steps of a BigDFTLogfile, as `read_posinp` dicts
+
+    Only the structure, forces and energy sections of each document are
+    parsed. Documents without a structure are skipped, as are malformed
+    ones, such as the last step of a run killed while writing it
+    """
+    for step in logfile.iter_steps():
+        try:
+            posinp = read_step(step)
+        except (*yaml_backend.errors(), KeyError, TypeError, ValueError):
+            continue
+        if posinp is not None:
+            yield posinp
+
+
+def read_step(step):
+    """
+    Read the structure, forces and energy of a logfile document, as a
+    `read_posinp` dict, or None if it has no structure
+    """
+    content = next((step[key] for key in STRUCTURE_KEYS if key in step), None)
+    if not content:
+        return None
+    posinp = read_posinp(content)
+    if FORCES_KEY in step:
+        posinp["forces"] = split_atoms(step[FORCES_KEY])[1]
+    if ENERGY_KEY in step:
+        posinp["energy"] = float(step[ENERGY_KEY])
+    return posinp
+
+
+def posout_steps(folder, names):
+    """
+    Generator over the posout files `names` of `folder`, as `read_posinp`
+    dicts, in step order
+    """
+    for name in sorted(names):
+        with folder.open(name, "rb") as handle:
+            yield read_posinp(yaml_backend.load(handle))
+
+
+def trajectory_arrays(steps, n_steps: int) -> dict:
+    """
+    Stack the `steps` of a run into arrays
+
+    :param steps: iterable of `read_posinp` dicts
+    :param n_steps: upper bound on the number of steps, used to allocate
+        the arrays
+    :returns: dict of `symbols`, and the `positions` and `cells` (angstroem),
+        `energies` (Ha) and `forces` (Ha/Bohr) arrays, with one row per step.
+        `cells` is None if the structure has no cell. Missing cells, energies
+        and forces are NaN
+    """
+    steps = iter(steps)
+    first = next(steps, None)
+    if first is None:
+        raise ValueError("the run has no steps")
+
+    symbols = first["symbols"]
+    nat = len(symbols)
+    positions = np.empty((n_steps, nat, 3))
+    forces = np.full((n_steps, nat, 3), np.nan)
+    energies = np.full(n_steps, np.nan)
+    cells = None if first["cell"] is None else np.full((n_steps, 3, 3), np.nan)
+
+    count = 0
+    for step in itertools.chain([first], steps):
+        if count == n_steps:
+            raise ValueError(f"the run has more than {n_steps} steps")
+        if len(step["symbols"]) != nat:
+            raise ValueError(
+                f"step {count} has {len(step['symbols'])} atoms, not {nat}"
+            )
+        positions[count] = step["positions"]
+        if cells is not None and step["cell"] is not None:
+            cells[count] = step["cell"]
+        if "forces" in step:
+            forces[count] = step["forces"]
+        if "energy" in step:
+            energies[count] = step["energy"]
+        count += 1
+
+    return {
+        "symbols": symbols,
+        "positions": positions[:count],
+        "cells": None if cells is None else cells[:count],
+        "energies": energies[:count],
+        "forces": forces[:count],
+    }
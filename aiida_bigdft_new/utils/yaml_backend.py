@@ -0,0 +1,183 @@
+"""
+Single entry point for all yaml reading and writing done by the plugin
+
+The fastest available backend is selected on import:
+
+ 1. `libyaml`: PyYAML's C accelerated `CSafeLoader`/`CSafeDumper`
+ 2. `python`: PyYAML's pure python `SafeLoader`/`SafeDumper`
+
+`ryaml` (a rust parser, installed with the `ryaml` extra) is faster still,
+but follows the yaml 1.2 spec. BigDFT writes yaml 1.1, so values such as
+`Yes` or the sexagesimal walltime `00:00:12.3` will be left as strings. It
+is therefore only used when requested, either through `set_backend` or the
+`AIIDA_BIGDFT_YAML_BACKEND` environment variable.
+"""
+
+import io
+import os
+
+import yaml
+
+ENVIRONMENT_VARIABLE = "AIIDA_BIGDFT_YAML_BACKEND"
+
+
+class YamlBackend:
+    """
+    A named set of yaml load, load_all and dump functions
+
+    :param name: name of the backend
+    :param load: callable(str) returning the first document
+    :param load_all: callable(str) returning an iterable of all documents
+    :param dump: callable(data) returning the serialised string
+    :param errors: tuple of exceptions raised by the parser on invalid input
+    """
+
+    def __init__(self, name, load, load_all, dump, errors):
+        self.name = name
+        self._load = load
+        self._load_all = load_all
+        self._dump = dump
+        self.errors = errors
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name})"
+
+    def load(self, stream):
+        """
+        Load the first document from a string, bytes, or file handle
+        """
+        return self._load(stream)
+
+    def load_all(self, stream):
+        """
+        Load all documents from a string, bytes, or file handle
+        """
+        return self._load_all(stream)
+
+    def dump(self, data, stream=None):
+        """
+        Serialise `data`, writing to `stream` if given, otherwise returning a str
+        """
+        string = self._dump(data)
+        if stream is None:
+            return string
+        if isinstance(stream, io.TextIOBase):
+            stream.write(string)
+        else:
+            stream.write(string.encode("utf8"))
+        return None
+
+
+def _pyyaml_backend(name, loader, dumper):
+    """
+    Create a backend from a PyYAML Loader/Dumper pair
+    """
+
+    def load(stream):
+        return next(yaml.load_all(stream, Loader=loader), None)
+
+    def load_all(stream):
+        return yaml.load_all(stream, Loader=loader)
+
+    def dump(data):
+        return yaml.dump(data, Dumper=dumper)
+
+    return YamlBackend(name, load, load_all, dump, (yaml.YAMLError,))
+
+
+def _ryaml_backend():
+    """
+    Create a backend from the optional ryaml package
+    """
+    import ryaml  # pylint: disable=import-outside-toplevel
+
+    def _text(stream):
+        if not isinstance(stream, (str, bytes)):
+            stream = stream.read()
+        if isinstance(stream, bytes):
+            stream = stream.decode("utf8")
+        return stream
+
+    def load(stream):
+        return next(iter(ryaml.loads_all(_text(stream))), None)
+
+    def load_all(stream):
+        return ryaml.loads_all(_text(stream))
+
+    return YamlBackend("ryaml", load, load_all, ryaml.dumps, (ryaml.InvalidYamlError,))
+
+
+def available_backends() -> dict:
+    """
+    Return all importable backends, fastest (yaml 1.1 compliant) first
+    """
+    backends = {}
+    if getattr(yaml, "__with_libyaml__", False):
+        backends["libyaml"] = _pyyaml_backend(
+            "libyaml", yaml.CSafeLoader, yaml.CSafeDumper
+        )
+    backends["python"] = _pyyaml_backend("python", yaml.SafeLoader, yaml.SafeDumper)
+    try:
+        backends["ryaml"] = _ryaml_backend()
+    except ImportError:
+        pass
+    return backends
+
+
+def set_backend(name: str = None) -> YamlBackend:
+    """
+    Select the backend used by the plugin
+
+    :param name: name of the backend, defaults to the fastest available
+    :raises ValueError: if the requested backend is not available
+    """
+    global _backend  # pylint: disable=global-statement
+
+    backends = available_backends()
+    if name is None:
+        name = next(iter(backends))
+    if name not in backends:
+        raise ValueError(
+            f"yaml backend '{name}' is not available. Available backends: {list(backends)}"
+        )
+
+    _backend = backends[name]
+    return _backend
+
+
+def get_backend() -> YamlBackend:
+    """
+    Return the currently selected backend
+    """
+    return _backend
+
+
+def load(stream):
+    """
+    Load the first document from `stream` using the selected backend
+    """
+    return _backend.load(stream)
+
+
+def load_all(stream):
+    """
+    Load all documents from `stream` using the selected backend
+    """
+    return _backend.load_all(stream)
+
+
+def dump(data, stream=None):
+    """
+    Serialise `data` using the selected backend, see `YamlBackend.dump`
+    """
+    return _backend.dump(data, stream)
+
+
+def errors() -> tuple:
+    """
+    Return the exceptions raised by the selected backend on invalid input
+    """
+    return _backend.errors
+
+
+_backend = set_backend(os.environ.get(ENVIRONMENT_VARIABLE) or None)
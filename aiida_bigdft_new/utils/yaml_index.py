@@ -0,0 +1,274 @@
+"""
+Lightweight indexing of large yaml files, allowing top level sections to be
+parsed on demand rather than loading the whole document at once
+"""
+
+from collections.abc import Mapping
+import re
+
+import yaml
+
+from aiida_bigdft_new.utils import yaml_backend
+
+# characters which can never open a new top level key
+_NOT_KEY = {b"", b" ", b"\t", b"-", b"#", b"%", b"\r", b"\n"}
+
+
+_ALIAS = re.compile(rb"(?:^|[\s\[{,:])\*([^\s,\[\]{}]+)")
+
+
+class NotIndexableError(ValueError):
+    """
+    Raised when a document is not a block style mapping, and cannot be indexed
+    """
+
+
+def parse_key(line: bytes):
+    """
+    Return the (resolved) key which opens the top level `line`
+
+    Only the tokens up to the key/value separator are scanned, so the value
+    may continue over the following lines
+    """
+    text = line.decode("utf8")
+    try:
+        for token in yaml.scan(text):
+            if isinstance(token, yaml.ValueToken):
+                keytext = text[: token.start_mark.index]
+                return next(iter(yaml_backend.load(f"{keytext}: null")))
+            if isinstance(
+                token, (yaml.FlowMappingStartToken, yaml.FlowSequenceStartToken)
+            ):
+                break
+    except (yaml.YAMLError, *yaml_backend.errors()):
+        pass
+    raise NotIndexableError(f"could not find a top level key in line {text!r}")
+
+
+def flow_depth(line: bytes) -> int:
+    """
+    Return the change in flow collection depth caused by `line`
+
+    Brackets within comments and (single line) quoted strings are ignored
+    """
+    if b"'" in line or b'"' in line:
+        depth = 0
+        quote = None
+        for char in line.decode("utf8", errors="replace"):
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char == "#":
+                break
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+        return depth
+
+    if b"#" in line:
+        line = line.split(b"#", 1)[0]
+    return line.count(b"{") + line.count(b"[") - line.count(b"}") - line.count(b"]")
+
+
+def is_marker(line: bytes) -> bool:
+    """
+    Returns True if `line` is a document start (---) or end (...) marker
+    """
+    return line.startswith((b"---", b"...")) and line[3:4] in (
+        b"",
+        b" ",
+        b"\t",
+        b"\r",
+        b"\n",
+    )
+
+
+def index_documents(handle) -> list:
+    """
+    Scan the binary file `handle`, returning a list of (start, end) byte
+    offsets for each of the yaml documents it contains
+
+    Only document markers are looked for, no yaml is parsed
+    """
+    documents = []
+    start = offset = 0
+    content = False
+    for line in handle:
+        if is_marker(line):
+            if content:
+                documents.append((start, offset))
+                content = False
+            start = offset if line.startswith(b"---") else offset + len(line)
+        elif (
+            not content and line.strip() and not line.lstrip().startswith((b"#", b"%"))
+        ):
+            content = True
+        offset += len(line)
+
+    if content:
+        documents.append((start, offset))
+
+    return documents
+
+
+def index_sections(handle, start: int = 0, end: int = None) -> dict:
+    """
+    Scan the first document of the binary file `handle`, returning a dict of
+    {key: (start, end)} byte offsets for each of its top level keys
+
+    Scanning begins at byte `start`, and ends at byte `end` if given
+
+    The top level indentation is taken from the first key found, since BigDFT
+    indents its logfiles by a single space. Lines continuing a flow collection
+    are never treated as keys, as BigDFT wraps these at the top level indent
+
+    :raises NotIndexableError: if the document is not a block mapping
+    """
+    sections = {}
+    key = None
+    pad = None
+    depth = 0
+    handle.seek(start)
+    offset = start
+    for line in handle:
+        if end is not None and offset >= end:
+            break
+        if depth:
+            # continuing a flow collection opened on a previous line
+            depth = max(depth + flow_depth(line), 0)
+            offset += len(line)
+            continue
+        if b"{" in line or b"[" in line:
+            depth = max(flow_depth(line), 0)
+
+        if is_marker(line):
+            if key is not None or line.startswith(b"..."):
+                break  # end of the first document
+        elif pad is None:
+            stripped = line.lstrip(b" ")
+            if stripped.startswith(b"- ") or stripped.rstrip() == b"-":
+                raise NotIndexableError("document is a sequence")
+            if stripped[:1] not in _NOT_KEY:
+                pad = line[: len(line) - len(stripped)]
+                key = parse_key(line)
+                start = offset
+        elif line.startswith(pad) and line[len(pad) : len(pad) + 1] not in _NOT_KEY:
+            sections[key] = (start, offset)
+            key = parse_key(line)
+            start = offset
+        offset += len(line)
+
+    if key is not None:
+        sections[key] = (start, offset)
+
+    return sections
+
+
+class LazyYamlMapping(Mapping):
+    """
+    Read-only mapping over the top level of an indexed yaml file
+
+    Sections are only read and parsed on first access, then cached
+
+    :param opener: callable returning a context manager for a binary handle
+    :param sections: index of the file, as returned by `index_sections`
+    """
+
+    def __init__(self, opener, sections: dict):
+        self._opener = opener
+        self._sections = sections
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+
+        keys = [key]
+        while True:
+            chunk = self._read(keys)
+            try:
+                loaded = yaml_backend.load(chunk)
+                break
+            except yaml_backend.errors():
+                # may be an alias to an anchor in an earlier section, include that too
+                anchors = {
+                    self._find_anchor(name, key)
+                    for name in set(_ALIAS.findall(chunk))
+                    if b"&" + name not in chunk
+                }
+                if None in anchors or not anchors - set(keys):
+                    self._load_all()
+                    return self._cache[key]
+                keys.extend(anchors - set(keys))
+
+        self._cache.update(loaded)
+        return loaded[key]
+
+    def preload(self, keys):
+        """
+        Read and parse the sections of `keys` together, in a single forward
+        pass over the file rather than one per section. Keys which are not
+        in the file are ignored
+        """
+        keys = [key for key in keys if key in self._sections and key not in self._cache]
+        if not keys:
+            return
+        try:
+            self._cache.update(yaml_backend.load(self._read(keys)))
+        except yaml_backend.errors():
+            # e.g. aliases to other sections, these are resolved on access
+            pass
+
+    def _read(self, keys) -> bytes:
+        """
+        Read the raw sections for `keys`, in file order
+        """
+        spans = sorted(self._sections[key] for key in keys)
+        with self._opener() as handle:
+            chunks = []
+            for start, end in spans:
+                handle.seek(start)
+                chunks.append(handle.read(end - start))
+        return b"".join(chunks)
+
+    def _find_anchor(self, name: bytes, before, blocksize: int = 2**20):
+        """
+        Find the key of the section defining the anchor `name`, searching
+        backwards from the section `before`
+        """
+        needle = b"&" + name
+        limit = self._sections[before][0]
+        candidates = [k for k, span in self._sections.items() if span[1] <= limit]
+        with self._opener() as handle:
+            for key in reversed(candidates):
+                start, end = self._sections[key]
+                handle.seek(start)
+                tail = b""
+                while start < end:
+                    block = tail + handle.read(min(blocksize, end - start))
+                    if needle in block:
+                        return key
+                    start += blocksize
+                    tail = block[-len(needle) :]
+        return None
+
+    def _load_all(self):
+        """
+        Fall back on parsing the full document
+        """
+        self._cache.update(yaml_backend.load(self._read(list(self._sections))))
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __contains__(self, key):
+        return key in self._sections
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self._sections)})"
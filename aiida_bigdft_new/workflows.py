@@ -0,0 +1,164 @@
+"""
+Workflows provided by aiida_bigdft_new.
+
+Register workflows via the "aiida.workflows" entry point in pyproject.toml.
+"""
+from aiida.common import AttributeDict
+from aiida.engine import BaseRestartWorkChain, ProcessHandlerReport, while_
+from aiida.engine.processes.functions import calcfunction
+from aiida.engine.processes.workchains.utils import process_handler
+from aiida.orm import Int
+
+from aiida_bigdft_new.calculations import BigDFTCalculation
+
+
+@calcfunction
+def last_step_structure(structure, trajectory):
+    """
+    Return a copy of `structure` with the positions, and cell if any, of the
+    last step of `trajectory`
+    """
+    restart = structure.clone()
+    cells = trajectory.get_cells()
+    if cells is not None:
+        restart.reset_cell(cells[-1].tolist())
+    restart.reset_sites_positions(trajectory.get_positions()[-1].tolist())
+    return restart
+
+
+class BigDFTBaseWorkChain(BaseRestartWorkChain):
+    """
+    Run a BigDFTCalculation, restarting it on recoverable failures
+
+    - out of walltime: restart from the last geometry and, if the parameters
+      ask for the orbitals to be written, from the last wavefunctions
+    - out of memory: spread the job over more machines, up to `max_machines`,
+      then halve the MPI processes per machine while doubling their OpenMP
+      threads
+
+    The number of attempts is bounded by `max_iterations`.
+    """
+
+    _process_class = BigDFTCalculation
+
+    @classmethod
+    def define(cls, spec):
+        """Define inputs, outputs and outline of the workchain."""
+        super().define(spec)
+
+        spec.expose_inputs(BigDFTCalculation, namespace="bigdft")
+        spec.input(
+            "max_machines",
+            valid_type=Int,
+            default=lambda: Int(4),
+            help="Maximum number of machines when restarting out of memory jobs",
+        )
+
+        spec.outline(
+            cls.setup,
+            while_(cls.should_run_process)(
+                cls.run_process,
+                cls.inspect_process,
+            ),
+            cls.results,
+        )
+
+        spec.expose_outputs(BigDFTCalculation)
+
+        spec.exit_code(
+            310,
+            "ERROR_OUT_OF_RESOURCES",
+            message="No larger resources are available to restart the out of "
+            "memory calculation.",
+        )
+
+    def setup(self):
+        """Set the inputs of the first calculation."""
+        super().setup()
+        self.ctx.inputs = AttributeDict(
+            self.exposed_inputs(BigDFTCalculation, namespace="bigdft")
+        )
+
+    def _options(self) -> dict:
+        """Return a copy of the calculation options, to be modified."""
+        metadata = dict(self.ctx.inputs.get("metadata", {}))
+        options = dict(metadata.get("options", {}))
+        options["resources"] = dict(options.get("resources", {}))
+        metadata["options"] = options
+        self.ctx.inputs.metadata = metadata
+        return options
+
+    def _last_structure(self, node):
+        """
+        Return the last geometry of `node`, or None if it has none
+
+        The final structure is only written by a completed run, that of a
+        killed run is the last step of its trajectory
+        """
+        if "output_structure" in node.outputs:
+            return node.outputs.output_structure
+        if "trajectory" in node.outputs:
+            trajectory = node.outputs.trajectory
+            structure = self.ctx.inputs.structure
+            if trajectory.get_positions().shape[1] == len(structure.sites):
+                return last_step_structure(structure, trajectory)
+        return None
+
+    def _writes_orbitals(self) -> bool:
+        """Whether the calculations write their wavefunctions to disk."""
+        output = self.ctx.inputs.parameters.get_dict().get("output") or {}
+        return bool(output.get("orbitals"))
+
+    @process_handler(
+        priority=500, exit_codes=[BigDFTCalculation.exit_codes.ERROR_OUT_OF_WALLTIME]
+    )
+    def handle_out_of_walltime(self, node):
+        """Restart from the last geometry and wavefunctions."""
+        structure = self._last_structure(node)
+        if structure is not None:
+            self.ctx.inputs.structure = structure
+        if self._writes_orbitals() and "remote_folder" in node.outputs:
+            self.ctx.inputs.parent_folder = node.outputs.remote_folder
+
+        self.report(f"{node.process_label}<{node.pk}> ran out of walltime, restarting")
+        return ProcessHandlerReport(do_break=True)
+
+    @process_handler(
+        priority=400, exit_codes=[BigDFTCalculation.exit_codes.ERROR_OUT_OF_MEMORY]
+    )
+    def handle_out_of_memory(self, node):
+        """Restart on more machines, or with more threads per process."""
+        options = self._options()
+        resources = options["resources"]
+        machines = resources.get("num_machines", 1)
+        mpiprocs = resources.get("num_mpiprocs_per_machine", 1)
+        threads = options.get("omp_threads") or resources.get(
+            "num_cores_per_mpiproc", 1
+        )
+
+        if machines < self.inputs.max_machines.value:
+            resources["num_machines"] = min(
+                2 * machines, self.inputs.max_machines.value
+            )
+            change = f"{resources['num_machines']} machines"
+        elif mpiprocs > 1:
+            resources["num_mpiprocs_per_machine"] = mpiprocs // 2
+            resources["num_cores_per_mpiproc"] = 2 * threads
+            options["omp_threads"] = 2 * threads
+            change = (
+                f"{mpiprocs // 2} MPI processes per machine "
+                f"with {2 * threads} OpenMP threads"
+            )
+        else:
+            self.report(
+                f"{node.process_label}<{node.pk}> ran out of memory on "
+                "the largest available resources"
+            )
+            return ProcessHandlerReport(
+                do_break=True, exit_code=self.exit_codes.ERROR_OUT_OF_RESOURCES
+            )
+
+        self.report(
+            f"{node.process_label}<{node.pk}> ran out of memory, restarting on {change}"
+        )
+        return ProcessHandlerReport(do_break=True)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Compare the yaml backends available to the plugin on BigDFT logfiles.
+
+Usage: ./yaml_backends.py [LOGFILE ...]
+
+Without arguments, a representative multi-document logfile is generated by
+repeating the test logfile, mimicking a geometry optimisation. Dump timings
+are for an input file of `--atoms` atoms.
+"""
+import os
+import time
+
+import click
+
+from aiida_bigdft_new.utils import yaml_backend
+
+TEST_LOG = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    os.pardir,
+    "tests",
+    "input_files",
+    "log.yaml",
+)
+
+
+def representative_log(documents: int) -> bytes:
+    """
+    Build a logfile of `documents` BigDFT documents from the test logfile
+    """
+    with open(TEST_LOG, "rb") as o:
+        body = o.read().split(b"---\n", 1)[1]
+    return b"".join(b"---\n" + body for _ in range(documents))
+
+
+def best_of(func, repeat: int) -> float:
+    """
+    Return the fastest of `repeat` timings of `func()`
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def representative_input(atoms: int) -> dict:
+    """
+    Build an input file dict for a system of `atoms` atoms
+    """
+    return {
+        "dft": {"ixc": "LDA", "itermax": 5, "hgrids": [0.45, 0.45, 0.45]},
+        "posinp": {
+            "units": "angstroem",
+            "abc": [[40.0, 0.0, 0.0], [0.0, 40.0, 0.0], [0.0, 0.0, 40.0]],
+            "positions": [
+                {"Ti" if i % 3 else "O": [0.1 * i, 0.2 * i, 0.3 * i]}
+                for i in range(atoms)
+            ],
+        },
+    }
+
+
+def benchmark(data: bytes, repeat: int, atoms: int) -> list:
+    """
+    Time loading `data` and dumping an input file with every available backend
+    """
+    inpdict = representative_input(atoms)
+
+    rows = []
+    for name, backend in yaml_backend.available_backends().items():
+        rows.append(
+            (
+                name,
+                best_of(lambda b=backend: b.load(data), repeat),
+                best_of(lambda b=backend: list(b.load_all(data)), repeat),
+                best_of(lambda b=backend: b.dump(inpdict), repeat),
+            )
+        )
+    return rows
+
+
+@click.command()
+@click.argument("logfiles", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--documents",
+    "-n",
+    default=100,
+    show_default=True,
+    help="Number of documents in the generated logfile.",
+)
+@click.option(
+    "--atoms",
+    "-a",
+    default=1000,
+    show_default=True,
+    help="Number of atoms in the dumped input file.",
+)
+@click.option("--repeat", "-r", default=3, show_default=True, help="Timing repeats.")
+def cli(logfiles, documents, atoms, repeat):
+    """Run the benchmark, printing timings in seconds for each backend."""
+    inputs = {}
+    for path in logfiles:
+        with open(path, "rb") as o:
+            inputs[path] = o.read()
+    if not inputs:
+        inputs[f"generated ({documents} documents)"] = representative_log(documents)
+
+    for label, data in inputs.items():
+        click.echo(f"{label}: {len(data) / 2**20:.1f} MiB")
+        click.echo(f"{'backend':>10} {'load':>10} {'load_all':>10} {'dump':>10}")
+        rows = benchmark(data, repeat, atoms)
+        for name, load, load_all, dump in rows:
+            click.echo(f"{name:>10} {load:10.4f} {load_all:10.4f} {dump:10.4f}")
+        click.echo()
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
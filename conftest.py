@@ -1,6 +1,17 @@
 """pytest fixtures for simplified testing."""
+import os
+
 import pytest
 
+from aiida.common.folders import SandboxFolder
+from aiida.common.links import LinkType
+from aiida.engine.utils import instantiate_process
+from aiida.manage import get_manager
+from aiida.orm import CalcJobNode, FolderData
+
+from aiida_bigdft_new.calculations import BigDFTCalculation
+from tests import TEST_DIR
+
 pytest_plugins = ["aiida.manage.tests.pytest_fixtures"]
 
 
@@ -13,3 +24,85 @@ def clear_database_auto(clear_database):  # pylint: disable=unused-argument
 def bigdft_new_code(aiida_local_code_factory):
     """Get a bigdft_new code."""
     return aiida_local_code_factory(executable="diff", entry_point="bigdft_new")
+
+
+@pytest.fixture(scope="function")
+def generate_calc_job_node(aiida_localhost):
+    """Return a factory for stored BigDFTCalculation nodes with retrieved files."""
+
+    def factory(
+        files=("log.yaml", "time.yaml"),
+        options=None,
+        inputs=None,
+        contents=None,
+        entry_point="bigdft_new",
+    ):
+        """
+        Create a calculation node of the `entry_point` calculation, attaching
+        `files` from the test input files and the {name: text} `contents` as
+        its retrieved folder, and the nodes `inputs` as its inputs
+        """
+        node = CalcJobNode(
+            computer=aiida_localhost, process_type=f"aiida.calculations:{entry_point}"
+        )
+        node.set_option("resources", {"num_machines": 1, "num_mpiprocs_per_machine": 1})
+        node.set_option("output_filename", "log.yaml")
+        for name, value in (options or {}).items():
+            node.set_option(name, value)
+        for label, value in (inputs or {}).items():
+            node.base.links.add_incoming(
+                value.store(), link_type=LinkType.INPUT_CALC, link_label=label
+            )
+        node.store()
+
+        retrieved = FolderData()
+        for name in files:
+            retrieved.base.repository.put_object_from_file(
+                os.path.join(TEST_DIR, "input_files", name), name
+            )
+        for name, text in (contents or {}).items():
+            retrieved.base.repository.put_object_from_bytes(text.encode(), name)
+        retrieved.base.links.add_incoming(
+            node, link_type=LinkType.CREATE, link_label="retrieved"
+        )
+        retrieved.store()
+
+        return node
+
+    return factory
+
+
+@pytest.fixture(scope="function")
+def prepare_calculation(bigdft_new_code):
+    """Return a function running BigDFTCalculation.prepare_for_submission."""
+
+    def prepare(
+        structure, parameters, options=None, process_class=BigDFTCalculation, **inputs
+    ):
+        """
+        Prepare a calculation, returning the calcinfo and the content of the
+        files written to the sandbox folder
+
+        The structure is omitted if None, for calculations without one
+        """
+        if structure is not None:
+            inputs["structure"] = structure
+        process = instantiate_process(
+            get_manager().create_runner(with_persistence=False, communicator=None),
+            process_class,
+            code=bigdft_new_code,
+            parameters=parameters,
+            metadata={"options": {"withmpi": False, **(options or {})}},
+            **inputs,
+        )
+        with SandboxFolder() as folder:
+            calcinfo = process.prepare_for_submission(folder)
+            files = {}
+            for name in folder.get_content_list():
+                if folder.isdir(name):
+                    continue
+                with folder.open(name) as handle:
+                    files[name] = handle.read()
+        return calcinfo, files
+
+    return prepare
@@ -2,7 +2,17 @@
 Tests for calculations.
 """
 
+import os
 
+import numpy as np
+import pytest
+import yaml
+
+from aiida.common.datastructures import CodeRunMode
+from aiida.orm import Kind, RemoteData, Site, StructureData
+
+from aiida_bigdft_new.calculations import BigDFTPackedCalculation, structure_to_posinp
+from aiida_bigdft_new.data import BigDFTParameters
 from examples.example_01 import test_run
 
 
@@ -11,3 +21,258 @@ def test_process(bigdft_new_code):
     Run example test
     """
     test_run(bigdft_new_code)
+
+
+def legacy_structure_to_posinp(structure):
+    """
+    The original, xyz string based, conversion
+    """
+    string = structure._prepare_xyz()[0].decode().split("\n")
+    positions = []
+    for line in string[2:]:
+        positions.append({line.split()[0]: [float(p) for p in line.split()[1:]]})
+    return {
+        "units": "angstroem",
+        "positions": positions,
+        "abc": structure.get_ase().cell.tolist(),
+    }
+
+
+@pytest.mark.parametrize(
+    "cell", [[[4.0, 0, 0], [0, 5.0, 0], [0, 0, 6.0]], [[3, 0, 0], [1, 3, 0], [0, 1, 4]]]
+)
+def test_structure_to_posinp(cell):
+    """
+    The posinp matches the one built by the legacy implementation
+    """
+    pytest.importorskip("ase")  # required by the legacy implementation
+    structure = StructureData(cell=cell)
+    # a kind whose name differs from its symbol
+    structure.append_kind(Kind(symbols="Fe", name="Fe1"))
+    rng = np.random.default_rng(42)
+    for symbol in ["Ti", "O", "O", "H"]:
+        structure.append_atom(position=rng.random(3) * 3, symbols=symbol)
+    structure.append_site(Site(kind_name="Fe1", position=rng.random(3) * 3))
+
+    posinp = structure_to_posinp(structure)
+    legacy = legacy_structure_to_posinp(structure)
+
+    assert posinp["units"] == legacy["units"]
+    assert posinp["abc"] == legacy["abc"]
+    assert [list(p) for p in posinp["positions"]] == [
+        list(p) for p in legacy["positions"]
+    ]
+    for new, old in zip(posinp["positions"], legacy["positions"]):
+        (symbol,) = old
+        # the xyz string was rounded to 10 decimals
+        assert new[symbol] == pytest.approx(old[symbol], abs=1e-10)
+
+
+@pytest.mark.parametrize("symlink", [False, True])
+def test_restart_from_parent(prepare_calculation, aiida_localhost, tmp_path, symlink):
+    """
+    The wavefunctions of a parent folder's data directory, and only them, are
+    copied or linked, and the input guess reads them
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+    parameters = BigDFTParameters({"dft": {"hgrids": 0.4}})
+    parent_path = tmp_path / "parent"
+    (parent_path / "data").mkdir(parents=True)
+    for name in ("wavefunction-k001-NR.bin.b000001", "time.yaml", "posout_0001.yaml"):
+        (parent_path / "data" / name).write_text(name)
+    parent = RemoteData(computer=aiida_localhost, remote_path=str(parent_path))
+
+    calcinfo, files = prepare_calculation(
+        structure,
+        parameters,
+        {"symlink_parent": symlink},
+        parent_folder=parent,
+    )
+
+    entry = [(aiida_localhost.uuid, f"{parent_path}/data/wavefunction*", "data")]
+    if symlink:
+        assert calcinfo.remote_symlink_list == entry
+        assert not calcinfo.remote_copy_list
+    else:
+        assert calcinfo.remote_copy_list == entry
+        assert not calcinfo.remote_symlink_list
+
+    dft = yaml.safe_load(files["input.yaml"])["dft"]
+    assert dft == {"hgrids": 0.4, "inputpsiid": 2}
+
+    # the data directory is created with the sandbox, before the remote copy
+    workdir = tmp_path / "child"
+    (workdir / "data").mkdir(parents=True)
+    ((_, source, destination),) = entry
+    with aiida_localhost.get_transport() as transport:
+        if symlink:
+            transport.symlink(source, str(workdir / destination))
+        else:
+            transport.copy(source, str(workdir / destination))
+    assert os.listdir(workdir / "data") == ["wavefunction-k001-NR.bin.b000001"]
+    assert (
+        workdir / "data" / "wavefunction-k001-NR.bin.b000001"
+    ).is_symlink() == symlink
+
+
+def test_restart_keeps_input_guess(prepare_calculation, aiida_localhost):
+    """
+    An input guess given in the parameters is not overridden
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+    parameters = BigDFTParameters({"dft": {"inputpsiid": -1}})
+    parent = RemoteData(computer=aiida_localhost, remote_path="/scratch/parent")
+
+    _, files = prepare_calculation(structure, parameters, parent_folder=parent)
+
+    assert yaml.safe_load(files["input.yaml"])["dft"] == {"inputpsiid": -1}
+
+
+def test_dry_run(prepare_calculation, aiida_local_code_factory):
+    """
+    A dry run estimates the memory with bigdft-tool
+    """
+    estimate_code = aiida_local_code_factory(
+        executable="diff", entry_point="bigdft_new", label="bigdft-tool"
+    )
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+
+    calcinfo, files = prepare_calculation(
+        structure,
+        BigDFTParameters({"dft": {"hgrids": 0.4}}),
+        {"estimate_mpiprocs": 8},
+        dry_run=True,
+        estimate_code=estimate_code,
+    )
+
+    (codeinfo,) = calcinfo.codes_info
+    assert codeinfo.code_uuid == estimate_code.uuid
+    assert codeinfo.cmdline_params == ["-a", "memory-estimation", "-l", "-n", "8"]
+    assert calcinfo.retrieve_list == ["log.yaml"]
+    assert "input.yaml" in files
+
+
+def test_dry_run_requires_estimate_code(prepare_calculation):
+    """
+    A dry run can not be prepared without an estimate code
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+
+    with pytest.raises(ValueError, match="estimate_code"):
+        prepare_calculation(structure, BigDFTParameters({}), dry_run=True)
+
+
+def test_openmp_environment(prepare_calculation):
+    """
+    The OpenMP layout is exported in the submit script
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+    resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 2,
+        "num_cores_per_mpiproc": 4,
+    }
+
+    calcinfo, _ = prepare_calculation(
+        structure,
+        BigDFTParameters({}),
+        {"resources": resources, "omp_proc_bind": "close", "omp_places": "cores"},
+    )
+
+    assert calcinfo.prepend_text.splitlines() == [
+        "export OMP_NUM_THREADS=4",
+        "export OMP_PROC_BIND=close",
+        "export OMP_PLACES=cores",
+    ]
+
+    with pytest.raises(ValueError, match="omp_threads"):
+        prepare_calculation(
+            structure, BigDFTParameters({}), {"resources": resources, "omp_threads": 2}
+        )
+
+    options = {"resources": resources, "omp_threads": 2}
+    resources.pop("num_cores_per_mpiproc")
+    with pytest.raises(ValueError, match="num_cores_per_mpiproc"):
+        prepare_calculation(structure, BigDFTParameters({}), options)
+    with pytest.raises(ValueError, match="num_cores_per_mpiproc"):
+        prepare_calculation(
+            None,
+            BigDFTParameters({}),
+            options,
+            process_class=BigDFTPackedCalculation,
+            structures={"ti": structure},
+        )
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_packed(prepare_calculation, concurrent):
+    """
+    A packed calculation writes one input per structure, run under its label
+    """
+    structures = {}
+    for label, symbol in (("ti", "Ti"), ("o", "O")):
+        structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+        structure.append_atom(position=[0.0, 0.0, 0.0], symbols=symbol)
+        structures[label] = structure
+
+    calcinfo, files = prepare_calculation(
+        None,
+        BigDFTParameters({"dft": {"hgrids": 0.4}}),
+        {"concurrent": concurrent},
+        process_class=BigDFTPackedCalculation,
+        structures=structures,
+    )
+
+    assert sorted(files) == ["o.yaml", "ti.yaml"]
+    assert list(yaml.safe_load(files["ti.yaml"])["posinp"]["positions"][0]) == ["Ti"]
+    assert [c.cmdline_params for c in calcinfo.codes_info] == [["o"], ["ti"]]
+    expected = CodeRunMode.PARALLEL if concurrent else CodeRunMode.SERIAL
+    assert calcinfo.codes_run_mode == expected
+    assert calcinfo.retrieve_list[:3] == [
+        "log-o.yaml",
+        ["./data-o/time-o.yaml", ".", 2],
+        "forces_o.yaml",
+    ]
+
+
+def test_packed_concurrent_mpi(prepare_calculation):
+    """
+    Concurrent runs can not be launched with MPI
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+
+    with pytest.raises(ValueError, match="withmpi"):
+        prepare_calculation(
+            None,
+            BigDFTParameters({}),
+            {"concurrent": True, "withmpi": True},
+            process_class=BigDFTPackedCalculation,
+            structures={"ti": structure},
+        )
+
+
+def test_keep_raw(prepare_calculation):
+    """
+    Raw files which are not kept are retrieved to the temporary folder
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+
+    calcinfo, _ = prepare_calculation(structure, BigDFTParameters({}))
+    assert "log.yaml" in calcinfo.retrieve_list
+    assert not calcinfo.retrieve_temporary_list
+
+    calcinfo, _ = prepare_calculation(
+        structure, BigDFTParameters({}), {"keep_raw": "on_failure"}
+    )
+    assert calcinfo.retrieve_list == []
+    assert "log.yaml" in calcinfo.retrieve_temporary_list
+
+    with pytest.raises(ValueError, match="keep_raw"):
+        prepare_calculation(structure, BigDFTParameters({}), {"keep_raw": "sometimes"})
@@ -1,9 +1,15 @@
 """ Tests for command line interface."""
+import gzip
+import os
+
 from click.testing import CliRunner
+import pytest
 
 from aiida.plugins import DataFactory
 
 from aiida_bigdft_new.cli import export, list_
+from aiida_bigdft_new.data.BigDFTFile import BigDFTFile, BigDFTLogfile
+from tests import TEST_DIR
 
 
 # pylint: disable=attribute-defined-outside-init
@@ -13,7 +19,7 @@ class TestDataCli:
     def setup_method(self):
         """Prepare nodes for cli tests."""
         DiffParameters = DataFactory("bigdft_new")
-        self.parameters = DiffParameters({"ignore-case": True})
+        self.parameters = DiffParameters({"dft": {"hgrids": 0.4}})
         self.parameters.store()
         self.runner = CliRunner()
 
@@ -34,4 +40,78 @@ class TestDataCli:
         result = self.runner.invoke(
             export, [str(self.parameters.pk)], catch_exceptions=False
         )
-        assert "ignore-case" in result.output
+        assert "hgrids" in result.output
+
+    def test_data_diff_list_pages(self):
+        """Test 'verdi data bigdft_new list' pagination and filters
+
+        Tests that rows are ordered by pk, limited, offset and filtered.
+        """
+        DiffParameters = DataFactory("bigdft_new")
+        others = [DiffParameters({"output": {"orbitals": "binary"}}) for _ in range(3)]
+        for index, node in enumerate(others):
+            node.label = f"restart-{index}"
+            node.store()
+
+        result = self.runner.invoke(
+            list_, ["--raw", "--limit", "2", "--offset", "1"], catch_exceptions=False
+        )
+        pks = [int(line.split("\t")[0]) for line in result.output.splitlines()]
+        assert pks == [others[0].pk, others[1].pk]
+
+        result = self.runner.invoke(
+            list_,
+            ["--raw", "--key", "output", "--label", "%-2"],
+            catch_exceptions=False,
+        )
+        assert result.output.split("\t")[0] == str(others[2].pk)
+
+        result = self.runner.invoke(list_, ["--past-days", "1"], catch_exceptions=False)
+        assert result.output.splitlines()[0] == "PK\tUUID\tCreated\tLabel"
+        assert len(result.output.splitlines()) == 5
+
+    @pytest.mark.parametrize("compression", ["none", "gzip"])
+    def test_data_diff_export_file(self, tmp_path, compression):
+        """Test 'verdi data bigdft_new export' of a logfile
+
+        Tests that the file content is exported, optionally compressed.
+        """
+        path = os.path.join(TEST_DIR, "input_files", "log.yaml")
+        logfile = BigDFTLogfile(path).store()
+        outfile = tmp_path / "log.yaml.out"
+
+        self.runner.invoke(
+            export,
+            [str(logfile.pk), "-o", str(outfile), "-c", compression],
+            catch_exceptions=False,
+        )
+
+        opener = gzip.open if compression == "gzip" else open
+        with opener(outfile, "rb") as exported, open(path, "rb") as original:
+            assert exported.read() == original.read()
+
+    def test_data_diff_export_batch(self, tmp_path):
+        """Test 'verdi data bigdft_new export' of many nodes
+
+        Tests that the selected nodes and those of the query are exported.
+        """
+        logfiles = [
+            BigDFTLogfile(os.path.join(TEST_DIR, "input_files", "log.yaml")).store()
+            for _ in range(2)
+        ]
+        timefile = BigDFTFile(os.path.join(TEST_DIR, "input_files", "time.yaml"))
+        timefile.store()
+
+        result = self.runner.invoke(
+            export,
+            [str(self.parameters.pk), "-d", str(tmp_path), "--type", "logfile"],
+            catch_exceptions=False,
+        )
+
+        assert sorted(os.listdir(tmp_path)) == sorted(
+            [f"{self.parameters.pk}.txt"] + [f"{node.pk}-log.yaml" for node in logfiles]
+        )
+        assert len(result.output.splitlines()) == 3
+
+        result = self.runner.invoke(export, [str(self.parameters.pk), str(timefile.pk)])
+        assert result.exit_code != 0
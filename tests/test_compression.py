@@ -0,0 +1,83 @@
+"""
+Tests for the streaming compression of file contents
+"""
+import gzip
+import io
+import os
+
+import pytest
+
+from aiida_bigdft_new.data.BigDFTFile import BigDFTLogfile
+from aiida_bigdft_new.utils import compression
+from tests import TEST_DIR
+
+CONTENT = b"key: value\n" * 1000
+
+
+@pytest.mark.parametrize("chunk_size", [7, 2**20])
+def test_copy_gzip(chunk_size):
+    """
+    Content copied in chunks decompresses to the original
+    """
+    out = io.BytesIO()
+    compression.copy_compressed(io.BytesIO(CONTENT), out, "gzip", chunk_size=chunk_size)
+
+    assert not out.closed
+    assert gzip.decompress(out.getvalue()) == CONTENT
+
+
+def test_copy_zstd():
+    """
+    zstd compression requires the zstandard package
+    """
+    zstandard = pytest.importorskip("zstandard")
+
+    out = io.BytesIO()
+    compression.copy_compressed(io.BytesIO(CONTENT), out, "zstd")
+
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(out.getvalue()))
+    assert reader.read() == CONTENT
+
+
+def test_unknown_compression():
+    """
+    Unknown compressions are refused
+    """
+    with pytest.raises(ValueError, match="compression must be one of"):
+        compression.compressed_name("log.yaml", "bzip2")
+
+
+def test_dump_file(tmp_path, monkeypatch):
+    """
+    A file node is dumped in chunks, defaulting to the compressed filename
+    """
+    path = os.path.join(TEST_DIR, "input_files", "log.yaml")
+    logfile = BigDFTLogfile(path).store()
+    monkeypatch.chdir(tmp_path)
+
+    dumped = logfile.dump_file(compression="gzip")
+
+    assert dumped == os.path.join(str(tmp_path), "log.yaml.gz")
+    with gzip.open(dumped, "rb") as exported, open(path, "rb") as original:
+        assert exported.read() == original.read()
+
+
+def test_decompressing_reader():
+    """
+    The decompressed content can be read with seeks in both directions
+    """
+    compressed = gzip.compress(CONTENT)
+
+    with compression.open_decompressed(
+        lambda: io.BytesIO(compressed), "gzip"
+    ) as handle:
+        handle.seek(len(CONTENT) - 6)
+        assert handle.read() == b"value\n"
+        handle.seek(5)
+        assert handle.read(5) == b"value"
+        assert handle.seek(0, io.SEEK_END) == len(CONTENT)
+
+    with compression.open_decompressed(
+        lambda: io.BytesIO(compressed), "gzip", mode="r"
+    ) as text:
+        assert text.readline() == "key: value\n"
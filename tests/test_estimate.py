@@ -0,0 +1,32 @@
+"""
+Tests for resource suggestions from memory estimates
+"""
+
+import pytest
+
+from aiida_bigdft_new.utils.estimate import suggest_resources
+
+
+@pytest.mark.parametrize(
+    "memory,expected",
+    [
+        (100_000, {"num_machines": 2, "num_mpiprocs_per_machine": 32}),
+        (12_000, {"num_machines": 7, "num_mpiprocs_per_machine": 10}),
+        (1_000_000, {"num_machines": 2, "num_mpiprocs_per_machine": 32}),
+    ],
+)
+def test_suggest_resources(memory, expected):
+    """
+    Processes are packed on machines as memory allows
+    """
+    estimate = {"memory_peak": 1000, "mpiprocs": 64}
+
+    assert suggest_resources(estimate, memory, 32) == expected
+
+
+def test_suggest_resources_too_large():
+    """
+    A process which does not fit on a machine is an error
+    """
+    with pytest.raises(ValueError):
+        suggest_resources({"memory_peak": 1000, "mpiprocs": 4}, 1000, 32)
@@ -4,11 +4,14 @@ Tests that the inbuilt file objects funciton after database store and load
 
 import os
 
+import pytest
 import yaml
 
 from aiida.orm import load_node
 
-from aiida_bigdft_new.data.BigDFTFile import BigDFTFile
+from aiida_bigdft_new.data.BigDFTFile import BigDFTFile, BigDFTLogfile
+from aiida_bigdft_new.utils import compression
+from tests import TEST_DIR
 
 
 def test_saveload_file():
@@ -32,3 +35,143 @@ def test_saveload_file():
     reloaded = load_node(filenode.pk)
 
     assert reloaded.content == test_data
+
+
+def test_lazy_logfile():
+    """
+    Store a BigDFT logfile, checking that sections are only parsed on access
+    """
+
+    path = os.path.join(TEST_DIR, "input_files", "log.yaml")
+
+    filenode = BigDFTLogfile(path)
+    filenode.store()
+
+    reloaded = load_node(filenode.pk)
+
+    content = reloaded.content
+    assert "Ground State Optimization" in content
+    assert content["Energy (Hartree)"] == pytest.approx(-105.291133451109913)
+    assert list(content._cache) == ["Energy (Hartree)"]
+
+    # aliases to anchors in earlier sections should still resolve
+    assert content["Last Iteration"]["EKS"] == content["Energy (Hartree)"]
+    assert "Code logo" not in content._cache
+
+    with open(path, encoding="utf8") as o:
+        assert content == next(yaml.safe_load_all(o))
+
+
+def test_preload_sections():
+    """
+    The summary sections are read and parsed together
+    """
+    filenode = BigDFTLogfile(os.path.join(TEST_DIR, "input_files", "log.yaml"))
+    content = filenode.content
+
+    content.preload(["Energy (Hartree)", "BigDFT infocode", "Not a section"])
+
+    assert set(content._cache) == {"Energy (Hartree)", "BigDFT infocode"}
+    assert content["BigDFT infocode"] == 0
+
+
+def test_logfile_documents(tmp_path):
+    """
+    Build a multi document (geopt style) logfile, and check step access
+    """
+    with open(os.path.join(TEST_DIR, "input_files", "log.yaml"), encoding="utf8") as o:
+        body = o.read()
+
+    energies = [-105.1, -105.2, -105.3]
+    path = tmp_path / "log.yaml"
+    with open(path, "w", encoding="utf8") as o:
+        for energy in energies:
+            o.write(body.replace("-1.05291133451109913E+02", str(energy)))
+
+    filenode = BigDFTLogfile(str(path)).store()
+
+    assert filenode.n_documents == 3
+    assert [doc["Energy (Hartree)"] for doc in filenode.iter_documents()] == energies
+    assert [step["Energy (Hartree)"] for step in filenode.iter_steps(1)] == energies[1:]
+
+    last = filenode.get_step(-1)
+    assert last["Last Iteration"]["EKS"] == energies[-1]
+    assert filenode.get_document(0)["Energy (Hartree)"] == energies[0]
+    # content refers to the first document
+    assert filenode.content["Energy (Hartree)"] == energies[0]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_logfile(tmp_path, compression):
+    """
+    Store a compressed logfile, checking that reading it is unchanged
+    """
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    path = os.path.join(TEST_DIR, "input_files", "log.yaml")
+    with open(path, encoding="utf8") as o:
+        body = o.read()
+    multi = tmp_path / "log.yaml"
+    multi.write_text(body * 2, encoding="utf8")
+
+    filenode = BigDFTLogfile(str(multi), compression=compression).store()
+    reloaded = load_node(filenode.pk)
+
+    assert reloaded.compression == compression
+    assert reloaded.filename == "log.yaml"
+    with reloaded.base.repository.open("log.yaml", mode="rb") as raw:
+        assert len(raw.read()) < len(body)
+
+    assert reloaded.get_content() == body * 2
+    content = reloaded.content
+    assert content["Energy (Hartree)"] == pytest.approx(-105.291133451109913)
+    assert content == next(yaml.safe_load_all(body))
+    assert reloaded.n_documents == 2
+    assert reloaded.get_step(-1)["Last Iteration"]["EKS"] == pytest.approx(
+        -105.291133451109913
+    )
+    assert reloaded.logfile.energy == pytest.approx(-105.291133451109913)
+
+    dumped = reloaded.dump_file(str(tmp_path / "dumped.yaml"))
+    with open(dumped, encoding="utf8") as o:
+        assert o.read() == body * 2
+
+    with reloaded.as_path() as filepath:
+        assert filepath.read_text(encoding="utf8") == body * 2
+    with reloaded.open("log.yaml") as o:
+        assert o.read() == body * 2
+
+
+def test_compressed_steps(tmp_path, monkeypatch):
+    """
+    Walking the steps of a compressed logfile decompresses it only once, and
+    loading its Logfile reads all sections in one pass
+    """
+    with open(os.path.join(TEST_DIR, "input_files", "log.yaml"), encoding="utf8") as o:
+        body = o.read()
+    energies = [-105.1, -105.2, -105.3]
+    path = tmp_path / "log.yaml"
+    path.write_text(
+        "".join(body.replace("-1.05291133451109913E+02", str(e)) for e in energies),
+        encoding="utf8",
+    )
+    filenode = BigDFTLogfile(str(path), compression="gzip").store()
+    assert filenode.n_documents == 3
+
+    restarts = []
+    restart = compression.DecompressingReader._restart
+
+    def counted(reader):
+        restarts.append(reader)
+        restart(reader)
+
+    monkeypatch.setattr(compression.DecompressingReader, "_restart", counted)
+
+    steps = filenode.iter_steps()
+    assert [step["Energy (Hartree)"] for step in steps] == energies
+    assert len(restarts) == 1
+
+    restarts.clear()
+    assert filenode.logfile.energy == pytest.approx(energies[0])
+    # one pass to index the sections, one to read them all
+    assert len(restarts) == 2
@@ -0,0 +1,95 @@
+"""
+Tests for the generation and reuse of input files
+"""
+
+from aiida.orm import QueryBuilder, SinglefileData, StructureData
+
+from aiida_bigdft_new import calculations
+from aiida_bigdft_new.data import BigDFTParameters
+from aiida_bigdft_new.utils import input_cache
+
+
+def generate_structure():
+    """
+    Return a stored two atom structure
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+    structure.append_atom(position=[2.0, 2.0, 0.0], symbols="O")
+    return structure.store()
+
+
+def test_write_input(prepare_calculation, tmp_path, monkeypatch):
+    """
+    The input file is written to the sandbox only, without storing nodes
+    """
+    monkeypatch.chdir(tmp_path)
+    structure = generate_structure()
+    parameters = BigDFTParameters({"dft": {"hgrids": 0.4}}).store()
+
+    calcinfo, files = prepare_calculation(structure, parameters)
+
+    assert list(files) == ["input.yaml"]
+    assert "hgrids: 0.4" in files["input.yaml"]
+    assert calcinfo.local_copy_list == []
+    assert QueryBuilder().append(SinglefileData).count() == 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_write_posinp(prepare_calculation):
+    """
+    The structure can also be written in xyz format
+    """
+    structure = generate_structure()
+    parameters = BigDFTParameters({"dft": {"hgrids": 0.4}}).store()
+
+    _, files = prepare_calculation(structure, parameters, {"write_posinp": True})
+
+    assert files["posinp.xyz"].splitlines() == [
+        "2 angstroem",
+        "periodic 4.0 4.0 4.0",
+        "Ti 0.0 0.0 0.0",
+        "O 2.0 2.0 0.0",
+    ]
+
+
+def test_reuse_input(prepare_calculation, monkeypatch):
+    """
+    Identical inputs are only rendered once
+    """
+    input_cache.clear_caches()
+    rendered = []
+    render = calculations.render_input
+
+    def counting_render(structure, parameters, overrides=None):
+        rendered.append(parameters.pk)
+        return render(structure, parameters, overrides)
+
+    monkeypatch.setattr(calculations, "render_input", counting_render)
+
+    structure = generate_structure()
+    parameters = BigDFTParameters({"dft": {"hgrids": 0.4}}).store()
+    other = BigDFTParameters({"dft": {"hgrids": 0.3}}).store()
+
+    _, first = prepare_calculation(structure, parameters)
+    _, second = prepare_calculation(structure, parameters)
+    _, third = prepare_calculation(structure, other)
+
+    assert rendered == [parameters.pk, other.pk]
+    assert first == second
+    assert "hgrids: 0.3" in third["input.yaml"]
+
+
+def test_lru_cache():
+    """
+    The least recently used item is dropped first
+    """
+    cache = input_cache.LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
@@ -0,0 +1,401 @@
+"""
+Tests for the BigDFT parser
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from aiida.common import exceptions
+from aiida.orm import Bool, StructureData
+
+from aiida_bigdft_new.data.BigDFTTiming import time_matrix
+from aiida_bigdft_new.parsers import BigDFTPackedParser, BigDFTParser
+from aiida_bigdft_new.utils import trajectory
+from tests import TEST_DIR
+
+
+def test_parse_summary(generate_calc_job_node):
+    """
+    Parse a finished calculation, checking the extracted results summary
+    """
+    node = generate_calc_job_node()
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok
+    assert {"logfile", "timefile", "output_parameters"} <= set(results)
+
+    summary = results["output_parameters"].get_dict()
+    assert summary["energy"] == pytest.approx(-105.291133451109913)
+    assert summary["fermi_level"] == pytest.approx(-0.5015062018744)
+    assert summary["walltime"] == pytest.approx(12.345678901)
+    assert summary["nat"] == 3
+    assert summary["converged"] is True
+    assert summary["mpi_tasks"] == 2
+    assert summary["omp_threads"] == 2
+
+
+def test_parse_forces(generate_calc_job_node):
+    """
+    Parse the final forces and positions into array and structure outputs
+    """
+    node = generate_calc_job_node(files=("log.yaml", "time.yaml", "forces_posinp.yaml"))
+
+    results, _ = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    forces = results["forces"]
+    assert forces.get_array("forces").shape == (3, 3)
+    assert forces.get_array("forces")[0, 2] == pytest.approx(1.0e-3)
+    assert forces.get_array("positions")[1].tolist() == [2.0, 2.0, 0.0]
+    assert forces.base.attributes.get("symbols") == ["Ti", "O", "O"]
+
+    structure = results["output_structure"]
+    assert structure.get_formula() == "O2Ti"
+    assert structure.cell_lengths == pytest.approx([4.0, 4.0, 4.0])
+
+
+def test_parse_truncated_forces(generate_calc_job_node):
+    """
+    A truncated forces file is a parsing failure, unless the run was killed
+    """
+    truncated = {"forces_posinp.yaml": read_input_file("forces_posinp.yaml")[:36]}
+    node = generate_calc_job_node(contents=truncated)
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_PARSING_FAILED.status
+    )
+    assert "forces" not in results
+
+    node = generate_calc_job_node(
+        files=("log.yaml", "time.yaml", "_scheduler-stderr.txt"),
+        options={"scheduler_stderr": "_scheduler-stderr.txt"},
+        contents=truncated,
+    )
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_OUT_OF_WALLTIME.status
+    )
+    assert "output_parameters" in results
+    assert "forces" not in results
+
+
+def test_parse_timing(generate_calc_job_node):
+    """
+    Parse the timing file into columnar arrays, and aggregate them
+    """
+    node = generate_calc_job_node()
+
+    results, _ = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    timing = results["timing"]
+    assert timing.sections == ["INIT", "WFN_OPT"]
+    assert timing.base.attributes.get("mpi_tasks") == 2
+
+    top = timing.top_categories(2, section="WFN_OPT")
+    assert [category for category, _, _ in top] == ["Precondition", "PSolver Kernel"]
+
+    totals = timing.class_totals("WFN_OPT")
+    assert "Total" not in totals
+    assert totals["Convolutions"] == pytest.approx(3.73)
+    assert timing.load_imbalance("WFN_OPT")["Potential"] == pytest.approx(1.08 / 0.92)
+
+    names, matrix = time_matrix([timing, timing], section="WFN_OPT")
+    assert matrix.shape == (2, len(names))
+    assert matrix[1, names.index("Convolutions")] == pytest.approx(3.73)
+
+
+def test_parse_missing_timefile(generate_calc_job_node):
+    """
+    A missing timing file is a parsing failure
+    """
+    node = generate_calc_job_node(files=("log.yaml",))
+
+    _, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_PARSING_FAILED.status
+    )
+
+
+@pytest.mark.parametrize("pool_type", ["thread", "process"])
+def test_parse_in_pool(generate_calc_job_node, pool_type):
+    """
+    Parsing in a pool gives the same results as parsing inline
+    """
+    node = generate_calc_job_node(
+        options={"parser_workers": 2, "parser_pool": pool_type}
+    )
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok
+    summary = results["output_parameters"].get_dict()
+    assert summary["energy"] == pytest.approx(-105.291133451109913)
+    assert results["timing"].sections == ["INIT", "WFN_OPT"]
+
+
+def test_parse_stderr(generate_calc_job_node):
+    """
+    A scheduler timeout in stderr sets the exit code
+    """
+    node = generate_calc_job_node(
+        files=("log.yaml", "time.yaml", "_scheduler-stderr.txt"),
+        options={"scheduler_stderr": "_scheduler-stderr.txt"},
+    )
+
+    _, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_OUT_OF_WALLTIME.status
+    )
+
+
+def test_parse_estimate(generate_calc_job_node):
+    """
+    A dry run gives the memory estimate, and no timing
+    """
+    node = generate_calc_job_node(
+        files=("log.yaml",),
+        options={"estimate_mpiprocs": 4},
+        inputs={"dry_run": Bool(True)},
+    )
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok
+    assert "timing" not in results
+    estimate = results["estimate"].get_dict()
+    assert estimate["memory_peak"] == 143
+    assert estimate["mpiprocs"] == 4
+    assert estimate["grid_points"] == [17, 17, 17]
+    assert estimate["total_grid_points"] == 17**3
+
+
+def read_input_file(name):
+    """Return the text of a test input file."""
+    with open(os.path.join(TEST_DIR, "input_files", name), encoding="utf8") as o:
+        return o.read()
+
+
+def test_parse_trajectory(generate_calc_job_node):
+    """
+    Build the trajectory of a multi document (geopt style) logfile
+    """
+    body = read_input_file("log.yaml")
+    energies = [-105.1, -105.2, -105.3]
+    log = "".join(
+        body.replace("-1.05291133451109913E+02", str(energy)).replace(
+            "- Ti: [  2.0000000000", f"- Ti: [  {2.0 + 0.1 * step}"
+        )
+        for step, energy in enumerate(energies)
+    )
+    node = generate_calc_job_node(files=("time.yaml",), contents={"log.yaml": log})
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok
+    trajectory = results["trajectory"]
+    assert trajectory.numsteps == 3
+    assert trajectory.symbols == ["Ti", "O", "O"]
+    assert trajectory.get_positions()[:, 0, 0] == pytest.approx([2.0, 2.1, 2.2])
+    assert trajectory.get_cells()[0] == pytest.approx(np.diag([4.0, 4.0, 4.0]))
+    assert trajectory.get_array("energies").tolist() == energies
+    assert trajectory.get_array("forces").shape == (3, 3, 3)
+
+
+def test_parse_trajectory_killed(generate_calc_job_node):
+    """
+    The last step of a run killed while writing it is left out of the
+    trajectory
+    """
+    body = read_input_file("log.yaml")
+    truncated = body[: body.index(" Atomic structure") + 60]
+    node = generate_calc_job_node(
+        files=("_scheduler-stderr.txt",),
+        options={"scheduler_stderr": "_scheduler-stderr.txt"},
+        contents={"log.yaml": body + body + truncated},
+    )
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_OUT_OF_WALLTIME.status
+    )
+    assert results["trajectory"].numsteps == 2
+    assert "output_structure" not in results
+
+
+def test_trajectory_missing_cell():
+    """
+    Steps without a cell get NaN cells, rather than uninitialised ones
+    """
+    step = {"symbols": ["Ti"], "positions": [[0.0, 0.0, 0.0]], "cell": np.eye(3)}
+    arrays = trajectory.trajectory_arrays([step, {**step, "cell": None}], 4)
+
+    assert arrays["cells"][0] == pytest.approx(np.eye(3))
+    assert np.isnan(arrays["cells"][1]).all()
+
+
+def test_parse_killed_single_point(generate_calc_job_node):
+    """
+    A single point run killed during the SCF leaves a truncated first
+    document, from which a partial summary is extracted
+    """
+    body = read_input_file("log.yaml")
+    truncated = body[: body.index(" Ground State Optimization") + 200]
+    node = generate_calc_job_node(
+        files=("_scheduler-stderr.txt",),
+        options={"scheduler_stderr": "_scheduler-stderr.txt"},
+        contents={"log.yaml": truncated},
+    )
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_OUT_OF_WALLTIME.status
+    )
+    summary = results["output_parameters"].get_dict()
+    assert summary["nat"] == 3
+    assert "energy" not in summary
+
+
+def test_parse_trajectory_posout(generate_calc_job_node):
+    """
+    Build the trajectory from the retrieved posout files
+    """
+    body = read_input_file("forces_posinp.yaml")
+    contents = {
+        f"data/posout_{step:04d}.yaml": body.replace(
+            "-1.05291133451109913E+02", str(energy)
+        )
+        for step, energy in enumerate([-105.2, -105.1])
+    }
+    node = generate_calc_job_node(contents=contents)
+
+    results, _ = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    trajectory = results["trajectory"]
+    assert trajectory.numsteps == 2
+    assert trajectory.get_array("energies").tolist() == [-105.2, -105.1]
+    assert trajectory.get_array("forces")[1, 0, 2] == pytest.approx(1.0e-3)
+
+
+def test_parse_single_step(generate_calc_job_node):
+    """
+    A single point calculation has no trajectory
+    """
+    node = generate_calc_job_node()
+
+    results, _ = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert "trajectory" not in results
+
+
+def test_packed_parser_wrong_node(generate_calc_job_node):
+    """
+    The packed parser only parses packed calculations
+    """
+    node = generate_calc_job_node()
+
+    with pytest.raises(exceptions.ParsingError, match="BigDFTPackedCalculation"):
+        BigDFTPackedParser(node)
+
+
+def test_parse_packed(generate_calc_job_node):
+    """
+    Split the output of a packed calculation into the outputs of each run
+    """
+    structures = {}
+    for label in ("first", "second", "failed"):
+        structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+        structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+        structures[f"structures__{label}"] = structure
+    contents = {}
+    for label in ("first", "second"):
+        contents[f"log-{label}.yaml"] = read_input_file("log.yaml")
+        contents[f"data-{label}/time-{label}.yaml"] = read_input_file("time.yaml")
+    contents["forces_first.yaml"] = read_input_file("forces_posinp.yaml")
+    node = generate_calc_job_node(
+        files=(), contents=contents, inputs=structures, entry_point="bigdft_new.packed"
+    )
+
+    results, calcfunction = BigDFTPackedParser.parse_from_node(
+        node, store_provenance=False
+    )
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_RUNS_FAILED.status
+    )
+    assert set(results["logfile"]) == {"first", "second"}
+    assert set(results["timing"]) == {"first", "second"}
+    summary = results["output_parameters"]["second"].get_dict()
+    assert summary["energy"] == pytest.approx(-105.291133451109913)
+    assert set(results["output_structure"]) == {"first"}
+
+
+def test_parse_compressed(generate_calc_job_node):
+    """
+    The logfile and timefile are stored compressed, and read transparently
+    """
+    node = generate_calc_job_node(options={"store_compression": "gzip"})
+
+    results, calcfunction = BigDFTParser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok
+    assert results["logfile"].compression == "gzip"
+    assert results["timefile"].compression == "gzip"
+    assert results["output_parameters"]["energy"] == pytest.approx(-105.291133451109913)
+    assert results["logfile"].get_content() == read_input_file("log.yaml")
+
+
+@pytest.mark.parametrize("keep_raw", ["never", "on_failure"])
+def test_parse_temporary(generate_calc_job_node, tmp_path, keep_raw):
+    """
+    Raw files retrieved to the temporary folder are parsed, but not stored
+    """
+    for name in ("log.yaml", "time.yaml"):
+        (tmp_path / name).write_text(read_input_file(name))
+    node = generate_calc_job_node(files=(), options={"keep_raw": keep_raw})
+
+    results, calcfunction = BigDFTParser.parse_from_node(
+        node, store_provenance=False, retrieved_temporary_folder=str(tmp_path)
+    )
+
+    assert calcfunction.is_finished_ok
+    assert results["output_parameters"]["energy"] == pytest.approx(-105.291133451109913)
+    assert results["timing"].sections == ["INIT", "WFN_OPT"]
+    assert "logfile" not in results
+    assert "timefile" not in results
+    assert "raw_files" not in results
+
+
+def test_parse_temporary_failure(generate_calc_job_node, tmp_path):
+    """
+    The raw files of a failed calculation are kept with `keep_raw="on_failure"`
+    """
+    (tmp_path / "log.yaml").write_text(read_input_file("log.yaml"))
+    node = generate_calc_job_node(files=(), options={"keep_raw": "on_failure"})
+
+    results, calcfunction = BigDFTParser.parse_from_node(
+        node, store_provenance=False, retrieved_temporary_folder=str(tmp_path)
+    )
+
+    assert (
+        calcfunction.exit_status
+        == node.process_class.exit_codes.ERROR_PARSING_FAILED.status
+    )
+    assert results["raw_files"].list_object_names() == ["log.yaml"]
+    assert "logfile" not in results
@@ -0,0 +1,93 @@
+"""
+Tests for the reduction of the logfile on the compute node
+"""
+import gzip
+import io
+import os
+import sys
+
+import yaml
+
+from aiida.orm import StructureData
+
+from aiida_bigdft_new.data import BigDFTParameters
+from aiida_bigdft_new.utils import reduce_log
+from aiida_bigdft_new.utils.summary import extract_summary
+from tests import TEST_DIR
+
+LOGFILE = os.path.join(TEST_DIR, "input_files", "log.yaml")
+
+
+def test_reduce_on_transport(prepare_calculation, aiida_localhost, tmp_path):
+    """
+    The appended reduction, run through the local transport, keeps the
+    summary sections and gzips the full logfile and debug files
+    """
+    structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+    structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+    calcinfo, files = prepare_calculation(
+        structure,
+        BigDFTParameters({}),
+        {"reduce_log": True, "reduce_python": sys.executable},
+    )
+    assert "log.yaml.gz" in calcinfo.retrieve_list
+
+    for name in ("reduce_log.py", "reduce_log.json"):
+        (tmp_path / name).write_text(files[name])
+    with open(LOGFILE, "rb") as handle:
+        full = handle.read()
+    (tmp_path / "log.yaml").write_bytes(full)
+    (tmp_path / "debug").mkdir()
+    (tmp_path / "debug" / "bigdft-err-0.yaml").write_text("error\n")
+
+    with aiida_localhost.get_transport() as transport:
+        retval, _, stderr = transport.exec_command_wait(
+            calcinfo.append_text, workdir=str(tmp_path)
+        )
+    assert retval == 0, stderr
+
+    assert gzip.decompress((tmp_path / "log.yaml.gz").read_bytes()) == full
+    assert os.listdir(tmp_path / "debug") == ["bigdft-err-0.yaml.gz"]
+    reduced = yaml.safe_load((tmp_path / "log.yaml").read_text())
+    assert "Code logo" not in reduced
+    assert "Atomic structure" in reduced
+    assert extract_summary(reduced) == extract_summary(yaml.safe_load(full))
+
+
+def test_reduce_keeps_anchors():
+    """
+    Sections defining anchors of kept sections are kept, flow collections
+    and quoted strings spanning lines are not split
+    """
+    content = (
+        "---\n"
+        ' logo: "a\n'
+        ' fake: key"\n'
+        " flow: [1,\n"
+        " 2]\n"
+        " defined: &ANCHOR 3\n"
+        " dropped: 4\n"
+        " kept: *ANCHOR\n"
+        "---\n"
+        " kept: 5\n"
+    ).encode()
+
+    sections = reduce_log.scan_sections(io.BytesIO(content))
+    assert [section["key"] for section in sections] == [
+        None,
+        "logo",
+        "flow",
+        "defined",
+        "dropped",
+        "kept",
+        None,
+        "kept",
+    ]
+    kept = reduce_log.select_sections(sections, {"kept"})
+    assert [sections[index]["key"] for index in kept] == [
+        None,
+        "defined",
+        "kept",
+        None,
+        "kept",
+    ]
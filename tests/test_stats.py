@@ -0,0 +1,116 @@
+"""
+Tests for the statistics over many calculations
+"""
+import json
+
+from click.testing import CliRunner
+import numpy as np
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, Dict
+
+from aiida_bigdft_new.cli import stats_
+from aiida_bigdft_new.stats import aggregate, calculation_stats, format_rows
+
+
+@pytest.fixture
+def calculations(aiida_localhost):
+    """Store calculations with their exit status and summary."""
+
+    def create(exit_status, summary=None):
+        node = CalcJobNode(
+            computer=aiida_localhost, process_type="aiida.calculations:bigdft_new"
+        )
+        node.set_exit_status(exit_status)
+        node.store()
+        if summary is not None:
+            output = Dict(summary)
+            output.base.links.add_incoming(
+                node, link_type=LinkType.CREATE, link_label="output_parameters"
+            )
+            output.store()
+        return node
+
+    create(0, {"nat": 3, "walltime": 10.0, "energy": -1.0})
+    create(0, {"nat": 3, "walltime": 20.0, "energy": -2.0})
+    create(0, {"nat": 6, "walltime": 50.0})
+    create(400, {"nat": 6, "walltime": 100.0})
+    create(300)
+
+
+def test_aggregate():
+    """
+    Groups are counted and reduced, ignoring missing values
+    """
+    columns = {
+        "exit_status": np.array([0.0, 0.0, 401.0]),
+        "nat": np.array([2.0, 2.0, 4.0]),
+        "walltime": np.array([1.0, 3.0, np.nan]),
+    }
+
+    rows = aggregate(columns, "nat", ["walltime"])
+
+    assert rows == [
+        {
+            "nat": 2,
+            "count": 2,
+            "failed": 0,
+            "walltime_mean": 2,
+            "walltime_std": 1,
+            "walltime_min": 1,
+            "walltime_max": 3,
+        },
+        {
+            "nat": 4,
+            "count": 1,
+            "failed": 1,
+            "walltime_mean": None,
+            "walltime_std": None,
+            "walltime_min": None,
+            "walltime_max": None,
+        },
+    ]
+
+
+def test_calculation_stats(calculations):  # pylint: disable=unused-argument
+    """
+    Statistics are grouped by system size, or by exit status
+    """
+    by_nat = calculation_stats("nat", ["walltime", "energy"])
+
+    assert [row["nat"] for row in by_nat] == [3, 6, None]
+    assert [row["count"] for row in by_nat] == [2, 2, 1]
+    assert by_nat[0]["walltime_mean"] == pytest.approx(15.0)
+    assert by_nat[0]["energy_min"] == pytest.approx(-2.0)
+    assert by_nat[1]["failed"] == 1
+    assert by_nat[1]["energy_mean"] is None
+
+    by_status = calculation_stats("exit_status")
+    assert [(row["exit_status"], row["fraction"]) for row in by_status] == [
+        (0, 0.6),
+        (300, 0.2),
+        (400, 0.2),
+    ]
+
+    with pytest.raises(ValueError, match="unknown quantities"):
+        calculation_stats("nat", ["symmetry"])
+
+
+def test_stats_cli(calculations):  # pylint: disable=unused-argument
+    """
+    The stats command renders the statistics as JSON, CSV or a table
+    """
+    runner = CliRunner()
+    result = runner.invoke(
+        stats_, ["-g", "nat", "-q", "walltime", "-f", "json"], catch_exceptions=False
+    )
+    assert json.loads(result.output) == calculation_stats("nat", ["walltime"])
+
+    result = runner.invoke(stats_, ["-f", "csv"], catch_exceptions=False)
+    assert result.output.splitlines()[0].startswith("exit_status,count,failed,")
+
+    assert format_rows([{"nat": 3, "count": 1}]).splitlines()[0].split() == [
+        "nat",
+        "count",
+    ]
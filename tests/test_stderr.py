@@ -0,0 +1,77 @@
+"""
+Tests for the scheduler stderr scanner
+"""
+
+import io
+import re
+
+import pytest
+
+from aiida_bigdft_new.utils import stderr
+from aiida_bigdft_new.utils.stderr import register_stderr_pattern, scan_stderr
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("all fine\n", None),
+        ("slurmstepd: Exceeded job memory limit\n", "ERROR_OUT_OF_MEMORY"),
+        # walltime takes precedence, wherever it appears
+        ("oom-kill\nCANCELLED DUE TO TIME LIMIT\n", "ERROR_OUT_OF_WALLTIME"),
+    ],
+)
+def test_scan(text, expected):
+    """
+    Match the default patterns
+    """
+    assert scan_stderr(text) == expected
+
+
+def test_scan_chunks():
+    """
+    Matches spanning chunks are found, and the tail can be scanned alone
+    """
+    text = b"noise\n" * 1000 + b"oom-kill\n" + b"noise\n" * 10
+
+    assert scan_stderr(io.BytesIO(text), chunk_size=7) == "ERROR_OUT_OF_MEMORY"
+    assert scan_stderr(io.BytesIO(text), tail=100) == "ERROR_OUT_OF_MEMORY"
+    assert scan_stderr(io.BytesIO(text), tail=20) is None
+
+
+def test_register_pattern(monkeypatch):
+    """
+    Registered patterns are matched, after the defaults
+    """
+    monkeypatch.setattr(stderr, "_registry", list(stderr.DEFAULT_PATTERNS))
+    register_stderr_pattern(r"job (\d+) preempted", "ERROR_OUT_OF_WALLTIME")
+
+    assert scan_stderr("job 12 preempted\n") == "ERROR_OUT_OF_WALLTIME"
+    assert scan_stderr("job 12 preempted\noom-kill\n") == "ERROR_OUT_OF_MEMORY"
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [r"job (\d+", r"(?i)preempted", r"(\w+) killed \1", r"(a)?(?(1)b|c)"],
+)
+def test_register_invalid_pattern(monkeypatch, pattern):
+    """
+    Patterns which can not be combined are refused when registered
+    """
+    monkeypatch.setattr(stderr, "_registry", list(stderr.DEFAULT_PATTERNS))
+    with pytest.raises(re.error):
+        register_stderr_pattern(pattern, "ERROR_OUT_OF_WALLTIME")
+
+    assert scan_stderr("all fine\n") is None
+
+
+def test_register_scoped_flags(monkeypatch):
+    """
+    Scoped flags and named backreferences are supported
+    """
+    monkeypatch.setattr(stderr, "_registry", list(stderr.DEFAULT_PATTERNS))
+    register_stderr_pattern(
+        r"(?i:preempted) (?P<id>\d) (?P=id)", "ERROR_OUT_OF_WALLTIME"
+    )
+
+    assert scan_stderr("PREEMPTED 1 1\n") == "ERROR_OUT_OF_WALLTIME"
+    assert scan_stderr("oom-kill\n") == "ERROR_OUT_OF_MEMORY"
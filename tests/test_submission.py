@@ -0,0 +1,86 @@
+"""
+Tests for batched submission
+"""
+
+from plumpy import ProcessState
+
+from aiida.orm import CalcJobNode, StructureData
+
+from aiida_bigdft_new import submission
+from aiida_bigdft_new.data import BigDFTParameters
+from aiida_bigdft_new.submission import count_active, submit_batch
+
+
+def generate_structures(count):
+    """
+    Yield single atom structures of increasing cell size
+    """
+    for i in range(count):
+        structure = StructureData(cell=[[4.0 + i, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+        structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+        yield structure
+
+
+def test_submit_batch(bigdft_new_code):
+    """
+    Inputs are stored before submission, equal parameters are shared, and
+    the code is looked up once from its label
+    """
+    submitted = []
+
+    def record(process_class, **inputs):
+        assert inputs["structure"].is_stored
+        assert inputs["parameters"].is_stored
+        submitted.append(inputs)
+        return len(submitted)
+
+    parameters = {"dft": {"hgrids": 0.4}}
+    jobs = ((structure, parameters) for structure in generate_structures(5))
+
+    report = submit_batch(
+        bigdft_new_code.full_label,
+        jobs,
+        options={"withmpi": False},
+        max_active=10,
+        batch_size=2,
+        submit_function=record,
+    )
+
+    assert report.nodes == [1, 2, 3, 4, 5]
+    assert report.rate > 0
+    assert len({inputs["parameters"].pk for inputs in submitted}) == 1
+    assert isinstance(submitted[0]["parameters"], BigDFTParameters)
+    assert {inputs["code"].pk for inputs in submitted} == {bigdft_new_code.pk}
+    assert submitted[0]["metadata"] == {"options": {"withmpi": False}}
+
+
+def test_submit_batch_instant(bigdft_new_code, monkeypatch):
+    """
+    Batches submitted within the resolution of the clock report a zero rate
+    """
+    monkeypatch.setattr(submission.time, "monotonic", lambda: 100.0)
+    jobs = ((structure, {}) for structure in generate_structures(3))
+
+    report = submit_batch(
+        bigdft_new_code,
+        jobs,
+        options={"withmpi": False},
+        batch_size=2,
+        submit_function=lambda process_class, **inputs: inputs["structure"].pk,
+    )
+
+    assert len(report.nodes) == 3
+    assert report.elapsed == 0.0
+    assert report.rate == 0.0
+
+
+def test_count_active(aiida_localhost):
+    """
+    Only unfinished calculations on the computer are counted
+    """
+    for state in (ProcessState.WAITING, ProcessState.RUNNING, ProcessState.FINISHED):
+        node = CalcJobNode(computer=aiida_localhost)
+        node.set_process_state(state)
+        node.store()
+
+    assert count_active(aiida_localhost) == 2
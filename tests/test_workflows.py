@@ -0,0 +1,135 @@
+"""
+Tests for the restart workchain
+"""
+
+import numpy as np
+import pytest
+
+from aiida.common.links import LinkType
+from aiida.engine.utils import instantiate_process
+from aiida.manage import get_manager
+from aiida.orm import CalcJobNode, Int, RemoteData, StructureData, TrajectoryData
+
+from aiida_bigdft_new.calculations import BigDFTCalculation
+from aiida_bigdft_new.data import BigDFTParameters
+from aiida_bigdft_new.workflows import BigDFTBaseWorkChain
+
+
+@pytest.fixture
+def generate_workchain(bigdft_new_code):
+    """Return a factory for set up BigDFTBaseWorkChain instances."""
+
+    def factory(parameters=None, resources=None, max_machines=4):
+        structure = StructureData(cell=[[4.0, 0, 0], [0, 4.0, 0], [0, 0, 4.0]])
+        structure.append_atom(position=[0.0, 0.0, 0.0], symbols="Ti")
+        options = {"withmpi": True}
+        if resources is not None:
+            options["resources"] = resources
+        process = instantiate_process(
+            get_manager().create_runner(with_persistence=False, communicator=None),
+            BigDFTBaseWorkChain,
+            bigdft={
+                "code": bigdft_new_code,
+                "structure": structure,
+                "parameters": BigDFTParameters(parameters or {}),
+                "metadata": {"options": options},
+            },
+            max_machines=Int(max_machines),
+        )
+        process.setup()
+        return process
+
+    return factory
+
+
+def failed_calculation(computer, exit_code, outputs=None):
+    """
+    Return a stored calculation node which failed with `exit_code`
+    """
+    node = CalcJobNode(
+        computer=computer, process_type=BigDFTCalculation.build_process_type()
+    )
+    node.set_exit_status(exit_code.status)
+    node.store()
+    for label, output in (outputs or {}).items():
+        output.base.links.add_incoming(
+            node, link_type=LinkType.CREATE, link_label=label
+        )
+        output.store()
+    return node
+
+
+def test_out_of_walltime(generate_workchain, aiida_localhost):
+    """
+    Restart from the last geometry and wavefunctions
+    """
+    process = generate_workchain(parameters={"output": {"orbitals": "binary"}})
+    remote = RemoteData(computer=aiida_localhost, remote_path="/scratch/run")
+    structure = StructureData(cell=[[5.0, 0, 0], [0, 5.0, 0], [0, 0, 5.0]])
+    structure.append_atom(position=[0.1, 0.0, 0.0], symbols="Ti")
+    node = failed_calculation(
+        aiida_localhost,
+        BigDFTCalculation.exit_codes.ERROR_OUT_OF_WALLTIME,
+        {"remote_folder": remote, "output_structure": structure},
+    )
+
+    report = process.handle_out_of_walltime(node)
+
+    assert report.do_break
+    assert process.ctx.inputs.parent_folder.uuid == remote.uuid
+    assert process.ctx.inputs.structure.uuid == structure.uuid
+
+
+def test_out_of_walltime_trajectory(generate_workchain, aiida_localhost):
+    """
+    Restart a run killed before writing its final structure from the last
+    step of its trajectory
+    """
+    process = generate_workchain()
+    trajectory = TrajectoryData()
+    trajectory.set_trajectory(
+        ["Ti"],
+        np.array([[[0.0, 0.0, 0.0]], [[0.2, 0.1, 0.0]]]),
+        cells=np.array([np.diag([4.0, 4.0, 4.0]), np.diag([4.5, 4.5, 4.5])]),
+    )
+    node = failed_calculation(
+        aiida_localhost,
+        BigDFTCalculation.exit_codes.ERROR_OUT_OF_WALLTIME,
+        {"trajectory": trajectory},
+    )
+
+    process.handle_out_of_walltime(node)
+
+    structure = process.ctx.inputs.structure
+    assert structure.sites[0].position == pytest.approx((0.2, 0.1, 0.0))
+    assert structure.cell_lengths == pytest.approx([4.5, 4.5, 4.5])
+    assert structure.get_kind_names() == ["Ti"]
+    assert "parent_folder" not in process.ctx.inputs
+
+
+def test_out_of_memory(generate_workchain, aiida_localhost):
+    """
+    Scale up the machines, then switch to more threads, then give up
+    """
+    resources = {"num_machines": 1, "num_mpiprocs_per_machine": 4}
+    process = generate_workchain(resources=resources, max_machines=2)
+    node = failed_calculation(
+        aiida_localhost, BigDFTCalculation.exit_codes.ERROR_OUT_OF_MEMORY
+    )
+
+    process.handle_out_of_memory(node)
+    options = process.ctx.inputs.metadata["options"]
+    assert options["resources"]["num_machines"] == 2
+
+    process.handle_out_of_memory(node)
+    options = process.ctx.inputs.metadata["options"]
+    assert options["resources"] == {
+        "num_machines": 2,
+        "num_mpiprocs_per_machine": 2,
+        "num_cores_per_mpiproc": 2,
+    }
+    assert options["omp_threads"] == 2
+
+    process.handle_out_of_memory(node)
+    report = process.handle_out_of_memory(node)
+    assert report.exit_code == BigDFTBaseWorkChain.exit_codes.ERROR_OUT_OF_RESOURCES
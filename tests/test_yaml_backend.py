@@ -0,0 +1,38 @@
+"""
+Tests for the pluggable yaml backend
+"""
+
+import io
+
+import pytest
+
+from aiida_bigdft_new.utils import yaml_backend
+
+
+@pytest.mark.parametrize("name", list(yaml_backend.available_backends()))
+def test_roundtrip(name):
+    """
+    Dump and reload an input-like dict through each available backend
+    """
+    backend = yaml_backend.available_backends()[name]
+
+    data = {"dft": {"ixc": "LDA", "hgrids": [0.45, 0.45, 0.45]}, "posinp": None}
+
+    stream = io.StringIO()
+    backend.dump(data, stream)
+
+    assert backend.load(stream.getvalue()) == data
+    assert list(backend.load_all(b"---\na: 1\n---\na: 2\n")) == [{"a": 1}, {"a": 2}]
+
+
+def test_select_backend():
+    """
+    The fastest backend is the default, and unknown backends are rejected
+    """
+    default = yaml_backend.get_backend()
+    assert default.name == next(iter(yaml_backend.available_backends()))
+
+    with pytest.raises(ValueError):
+        yaml_backend.set_backend("not_a_backend")
+
+    assert yaml_backend.get_backend() is default